@@ -120,13 +120,26 @@ class LevelAdmin(admin.ModelAdmin):
     list_filter = ("course",)
 
 
+class LessonTableInline(admin.StackedInline):
+    model = LessonTable
+    extra = 0
+    fields = ("content",)
+    verbose_name = "Таблица"
+    verbose_name_plural = "Таблица"
+
+
 # --- Админка Lesson ---
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
     list_display = ("order_num","title", "level", "slug",)
+    list_select_related = ("level__course",)
     search_fields = ("title", "level__title")
     list_filter = ("level",)
-    inlines = [ModuleInline, DictionaryGroupInline,OrthographyItemInline]
+    inlines = [LessonTableInline, ModuleInline, DictionaryGroupInline,OrthographyItemInline]
+
+    def get_queryset(self, request):
+        # описание орфографии в списке не показывается
+        return super().get_queryset(request).defer("orthography_description")
 
 #
 # # --- Админка Module ---
@@ -168,6 +181,7 @@ class ModuleBlockAdmin(admin.ModelAdmin):
     list_filter = ("module__lesson", "module")
     autocomplete_fields = ["module"]
     inlines = [LessonItemInline]
+    list_select_related = ("module__lesson",)
     search_fields = (
         "caption",
         "module__title",  # Поиск по названию модуля
@@ -176,6 +190,10 @@ class ModuleBlockAdmin(admin.ModelAdmin):
         "module__lesson__level__course__title",  # Поиск по названию курса
     )
 
+    def get_queryset(self, request):
+        # type3_content - большой HTML, в списке не нужен
+        return super().get_queryset(request).defer("type3_content")
+
     @admin.display(description='Превью текста')
     def caption_preview(self, obj):
         if obj.caption:
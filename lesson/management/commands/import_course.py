@@ -6,8 +6,10 @@ from urllib.parse import urlparse
 from django.core.management.base import BaseCommand
 from django.core.files.base import ContentFile
 from django.utils.text import slugify
+from lesson.services.progress import batch_lesson_changes
+from search.services.documents import batch_updates
 from lesson.models import (
-    Course, Level, Lesson, Module, ModuleBlock,
+    Course, Level, Lesson, LessonTable, Module, ModuleBlock,
     Video, Phrase, LessonItem, DictionaryGroup, DictionaryItem
 )
 
@@ -127,6 +129,12 @@ class Command(BaseCommand):
         parser.add_argument("path", type=str, help="Путь к папке курса")
 
     def handle(self, *args, **options):
+        # Поисковый индекс и прогресс уроков пересчитываются одним сбросом
+        # на весь импорт, а не после каждого сохранённого объекта
+        with batch_updates(), batch_lesson_changes():
+            self.import_files(*args, **options)
+
+    def import_files(self, *args, **options):
         course_path = options["path"]
 
         if not os.path.exists(course_path):
@@ -194,11 +202,10 @@ class Command(BaseCommand):
                         table_data = json.load(f)
                         table_image_base64 = table_data.get("image_base64")
 
-                lesson, _ = Lesson.objects.get_or_create(
+                lesson, lesson_created = Lesson.objects.get_or_create(
                     level=level,
                     title=lesson_title,
                     defaults={
-                        "table": table_image_base64,
                         "slug": lesson_slug,
                         "url": lesson_data.get("url"),
                         "short_description": lesson_data.get("short_description"),
@@ -206,6 +213,9 @@ class Command(BaseCommand):
                     }
                 )
 
+                if lesson_created and table_image_base64:
+                    LessonTable.objects.create(lesson=lesson, content=table_image_base64)
+
                 self.stdout.write(self.style.SUCCESS(f"    📙 Урок: {lesson.title}"))
 
                 # # --- MP3 урока ---
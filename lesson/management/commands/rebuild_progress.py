@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from lesson.services.progress import rebuild_progress
+
+
+class Command(BaseCommand):
+    help = "Пересчёт сводных таблиц прогресса (LessonProgress, LevelProgress, CourseProgress)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, nargs="*", help="ID пользователей (по умолчанию все)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = rebuild_progress(
+            user_ids=options["user"] or None,
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Прогресс пересчитан: уроки {created['lessons']}, "
+            f"уровни {created['levels']}, курсы {created['courses']}"
+        ))
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def _fill(model, counter_field, rows, target_field, batch_size=1000):
+    batch = []
+    for row in rows.iterator():
+        batch.append(model(**{
+            'user_id': row['user_id'],
+            target_field: row['target'],
+            counter_field: row['total'],
+        }))
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+
+
+def fill_progress(apps, schema_editor):
+    # Без заполнения уровни и курсы показывали бы 0%, а первые отметки
+    # считались бы от нуля и расходились с ModuleBlockDone/LessonDone
+    ModuleBlockDone = apps.get_model('lesson', 'ModuleBlockDone')
+    LessonDone = apps.get_model('lesson', 'LessonDone')
+    blocks_done = ModuleBlockDone.objects.filter(user__isnull=False, module_block__isnull=False)
+    lessons_done = LessonDone.objects.filter(user__isnull=False, lesson__isnull=False)
+
+    _fill(
+        apps.get_model('lesson', 'LessonProgress'), 'done_blocks',
+        blocks_done.values('user_id', target=F('module_block__module__lesson_id'))
+        .annotate(total=Count('module_block', distinct=True)).order_by(),
+        'lesson_id',
+    )
+    _fill(
+        apps.get_model('lesson', 'LevelProgress'), 'done_lessons',
+        lessons_done.values('user_id', target=F('lesson__level_id'))
+        .annotate(total=Count('lesson', distinct=True)).order_by(),
+        'level_id',
+    )
+    _fill(
+        apps.get_model('lesson', 'CourseProgress'), 'done_lessons',
+        lessons_done.values('user_id', target=F('lesson__level__course_id'))
+        .annotate(total=Count('lesson', distinct=True)).order_by(),
+        'course_id',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson', '0037_alter_phrase_options'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('done_lessons', models.IntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_progress', to='lesson.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'course')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LessonProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('done_blocks', models.IntegerField(default=0)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_progress', to='lesson.lesson')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'lesson')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LevelProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('done_lessons', models.IntegerField(default=0)),
+                ('level', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_progress', to='lesson.level')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='level_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'level')},
+            },
+        ),
+        migrations.RunPython(fill_progress, migrations.RunPython.noop),
+    ]
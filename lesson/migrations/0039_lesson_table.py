@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_tables_out(apps, schema_editor):
+    Lesson = apps.get_model('lesson', 'Lesson')
+    LessonTable = apps.get_model('lesson', 'LessonTable')
+    lessons = (
+        Lesson.objects
+        .exclude(table__isnull=True)
+        .exclude(table='')
+        .values_list('id', 'table')
+    )
+    batch = []
+    for lesson_id, table in lessons.iterator(chunk_size=100):
+        batch.append(LessonTable(lesson_id=lesson_id, content=table))
+        if len(batch) >= 100:
+            LessonTable.objects.bulk_create(batch)
+            batch = []
+    LessonTable.objects.bulk_create(batch)
+
+
+def move_tables_back(apps, schema_editor):
+    Lesson = apps.get_model('lesson', 'Lesson')
+    LessonTable = apps.get_model('lesson', 'LessonTable')
+    for lesson_id, content in LessonTable.objects.values_list('lesson_id', 'content').iterator(chunk_size=100):
+        Lesson.objects.filter(pk=lesson_id).update(table=content)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson', '0038_progress_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonTable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField(verbose_name='Таблица (base64)')),
+                ('lesson', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='table_data', to='lesson.lesson', verbose_name='Урок')),
+            ],
+        ),
+        migrations.RunPython(move_tables_out, move_tables_back),
+        migrations.RemoveField(
+            model_name='lesson',
+            name='table',
+        ),
+    ]
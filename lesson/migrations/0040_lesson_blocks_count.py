@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:10
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_blocks_count(apps, schema_editor):
+    Lesson = apps.get_model('lesson', 'Lesson')
+    ModuleBlock = apps.get_model('lesson', 'ModuleBlock')
+    counts = (
+        ModuleBlock.objects
+        .filter(module__lesson=OuterRef('pk'))
+        .order_by()
+        .values('module__lesson')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Lesson.objects.update(blocks_count=Coalesce(Subquery(counts), Value(0), output_field=IntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson', '0039_lesson_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='blocks_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_blocks_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:29
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson', '0040_lesson_blocks_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dictionaryitem',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['text_ru'], name='dict_text_ru_gist', opclasses=['gist_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='dictionaryitem',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['text_en'], name='dict_text_en_gist', opclasses=['gist_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['title'], name='lesson_title_gist', opclasses=['gist_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='phrase',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['text_ru'], name='lesson_phrase_text_ru_gist', opclasses=['gist_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='phrase',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['text_en'], name='lesson_phrase_text_en_gist', opclasses=['gist_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicates(apps, schema_editor):
+    ModuleBlockDone = apps.get_model('lesson', 'ModuleBlockDone')
+    LessonProgress = apps.get_model('lesson', 'LessonProgress')
+    duplicates = (
+        ModuleBlockDone.objects
+        .values('user_id', 'module_block_id')
+        .annotate(first=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    user_ids = set()
+    for row in duplicates.iterator():
+        ModuleBlockDone.objects.filter(
+            user_id=row['user_id'], module_block_id=row['module_block_id'],
+        ).exclude(pk=row['first']).delete()
+        user_ids.add(row['user_id'])
+    if not user_ids:
+        return
+
+    # Инкрементальные счётчики этих пользователей могли учесть дубли
+    done_counts = (
+        ModuleBlockDone.objects
+        .filter(user=OuterRef('user_id'), module_block__module__lesson=OuterRef('lesson_id'))
+        .order_by()
+        .values('user')
+        .annotate(total=Count('module_block', distinct=True))
+        .values('total')
+    )
+    LessonProgress.objects.filter(user_id__in=user_ids).update(
+        done_blocks=Coalesce(Subquery(done_counts), Value(0), output_field=IntegerField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson', '0041_trigram_gist'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='moduleblockdone',
+            constraint=models.UniqueConstraint(fields=('user', 'module_block'), name='module_block_done_unique'),
+        ),
+    ]
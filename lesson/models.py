@@ -3,7 +3,7 @@ from django.db import models
 from django.conf import settings
 from django_ckeditor_5.fields import CKEditor5Field
 
-from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import GinIndex, GistIndex
 
 class Course(models.Model):
     """Курс"""
@@ -44,11 +44,12 @@ class Lesson(models.Model):
     url = models.URLField(max_length=500, verbose_name="URL урока", null=True, blank=True, editable=False)
     mp3 = models.URLField(null=True, blank=True, verbose_name="Аудио MP3 урока", editable=False)
     file = models.FileField(upload_to='lessons/mp3/', null=True, blank=True)
-    table = models.TextField(null=True, blank=True)
     table_file = models.ImageField(upload_to='lesson/table',null=True, blank=True)
     orthography_description = models.TextField(verbose_name="Описание блока орфографии", null=True, blank=True)
     is_common = models.BooleanField('Обобщающий', default=False)
     is_free = models.BooleanField('Бесплатный', default=False)
+    # Кеш количества блоков урока (поддерживается сигналами ModuleBlock)
+    blocks_count = models.IntegerField(default=0, editable=False)
     def __str__(self):
         return f"{self.level.title} → {self.title}"
 
@@ -60,10 +61,24 @@ class Lesson(models.Model):
                 fields=["title"],
                 opclasses=["gin_trgm_ops"],
             ),
+            GistIndex(
+                name="lesson_title_gist",
+                fields=["title"],
+                opclasses=["gist_trgm_ops"],
+            ),
         ]
 
 
 
+class LessonTable(models.Model):
+    """Таблица урока (base64-картинка) - отдельно от Lesson, чтобы не тянуть её в списках"""
+    lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, related_name="table_data", verbose_name="Урок")
+    content = models.TextField(verbose_name="Таблица (base64)")
+
+    def __str__(self):
+        return f"Таблица: {self.lesson.title}"
+
+
 class Module(models.Model):
     """Модуль внутри урока"""
 
@@ -170,11 +185,21 @@ class Phrase(models.Model):
                 fields=["text_ru"],
                 opclasses=["gin_trgm_ops"],
             ),
+            GistIndex(
+                name="lesson_phrase_text_ru_gist",
+                fields=["text_ru"],
+                opclasses=["gist_trgm_ops"],
+            ),
             GinIndex(
                 name="lesson_phrase_text_en_trgm",
                 fields=["text_en"],
                 opclasses=["gin_trgm_ops"],
             ),
+            GistIndex(
+                name="lesson_phrase_text_en_gist",
+                fields=["text_en"],
+                opclasses=["gist_trgm_ops"],
+            ),
         ]
 
 class Watermark(models.Model):
@@ -217,21 +242,66 @@ class DictionaryItem(models.Model):
                 fields=["text_ru"],
                 opclasses=["gin_trgm_ops"],
             ),
+            GistIndex(
+                name="dict_text_ru_gist",
+                fields=["text_ru"],
+                opclasses=["gist_trgm_ops"],
+            ),
             GinIndex(
                 name="dict_text_en_trgm",
                 fields=["text_en"],
                 opclasses=["gin_trgm_ops"],
             ),
+            GistIndex(
+                name="dict_text_en_gist",
+                fields=["text_en"],
+                opclasses=["gist_trgm_ops"],
+            ),
         ]
 
 class ModuleBlockDone(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE,blank=True,null=True)
     module_block = models.ForeignKey('ModuleBlock',on_delete=models.CASCADE,blank=True,null=True)
 
+    class Meta:
+        constraints = [
+            # Счётчики LessonProgress считают отметки, дубли их бы завышали
+            models.UniqueConstraint(fields=["user", "module_block"], name="module_block_done_unique"),
+        ]
+
 class LessonDone(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE,blank=True,null=True)
     lesson = models.ForeignKey('Lesson',on_delete=models.CASCADE,blank=True,null=True)
 
+class LessonProgress(models.Model):
+    """Сколько блоков урока выполнил пользователь (поддерживается инкрементально)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="lesson_progress")
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="user_progress")
+    done_blocks = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "lesson")
+
+
+class LevelProgress(models.Model):
+    """Сколько уроков уровня выполнил пользователь"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="level_progress")
+    level = models.ForeignKey(Level, on_delete=models.CASCADE, related_name="user_progress")
+    done_lessons = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "level")
+
+
+class CourseProgress(models.Model):
+    """Сколько уроков курса выполнил пользователь"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="course_progress")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="user_progress")
+    done_lessons = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "course")
+
 class DictionaryItemFavorite(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE,blank=True,null=True)
     dictionary_item = models.ForeignKey(DictionaryItem,on_delete=models.CASCADE,blank=True,null=True)
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 
 from lesson.models import (
-    Course, Level, Lesson, Module, ModuleBlock,
+    Course, Level, Lesson, LessonTable, Module, ModuleBlock,
     Video, Phrase, LessonItem, DictionaryGroup, DictionaryItem, ModuleBlockDone, DictionaryItemFavorite,
     LessonItemFavoriteItem,OrthographyItem,OrthographyItemDone, Tariff, TariffItem,Watermark
 )
@@ -84,6 +84,10 @@ class ModuleBlockSerializer(serializers.ModelSerializer):
         fields = ["id", "sorting", "caption", "type3_content", "videos", "items","is_done","can_be_done"]
 
     def get_is_done(self, obj):
+        # list/update ModuleViewSet аннотируют блоки через Exists - без запроса на каждый блок
+        if hasattr(obj, "is_done"):
+            return obj.is_done
+
         request = self.context.get("request")
         if not request or request.user.is_anonymous:
             return False
@@ -156,7 +160,11 @@ class LessonSerializer(serializers.ModelSerializer):
         return obj.level.course.title
 
     def get_have_table(self, obj):
-        return bool(obj.table) or bool(obj.table_file)
+        # has_table аннотируется через Exists, чтобы не читать саму таблицу
+        has_table = getattr(obj, "has_table", None)
+        if has_table is None:
+            has_table = LessonTable.objects.filter(lesson=obj).exists()
+        return has_table or bool(obj.table_file)
 
 class LessonShortSerializer(serializers.ModelSerializer):
     progress = serializers.IntegerField(read_only=True)
@@ -222,4 +230,15 @@ class TariffSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tariff
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+
+class ModuleBlockToggleSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+
+
+class ModuleBlockStateSerializer(ModuleBlockToggleSerializer):
+    done = serializers.BooleanField()
+
+
+class ModuleBlockSyncSerializer(serializers.Serializer):
+    blocks = ModuleBlockStateSerializer(many=True, allow_empty=False, max_length=1000)
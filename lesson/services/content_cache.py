@@ -0,0 +1,128 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from user.services.entitlements import has_full_access
+
+
+CONTENT_VERSION_KEY = "content_version:{namespace}"
+PROGRESS_VERSION_KEY = "progress_version:{user_id}"
+# Номер формата в ключе: после изменения состава снапшотов старые записи не читаются
+SNAPSHOT_KEY = "content_snapshot:2:{kind}:{key}:{version}:{host}"
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    """
+    Версия - время последнего изменения в миллисекундах.
+    Если ключ пропал из кеша, версия начинается заново с текущего времени,
+    поэтому все производные кеши просто перестраиваются.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _now_ms(), None)
+        version = cache.get(key)
+    return version
+
+
+def _set_next_version(key):
+    cache.set(key, max(_now_ms(), (cache.get(key) or 0) + 1), None)
+
+
+def bump_version(key):
+    # Повторно после коммита: запрос, успевший между bump и коммитом
+    # закешировать старые данные под новой версией, будет инвалидирован
+    _set_next_version(key)
+    transaction.on_commit(lambda: _set_next_version(key))
+
+
+def get_content_version(namespace="lesson"):
+    return get_version(CONTENT_VERSION_KEY.format(namespace=namespace))
+
+
+def bump_content_version(namespace="lesson"):
+    bump_version(CONTENT_VERSION_KEY.format(namespace=namespace))
+
+
+def get_progress_version(user):
+    """Версия пользовательских данных (прогресс, избранное); 0 для анонима"""
+    if not user.is_authenticated:
+        return 0
+    return get_version(PROGRESS_VERSION_KEY.format(user_id=user.pk))
+
+
+def bump_progress_version(user):
+    bump_version(PROGRESS_VERSION_KEY.format(user_id=user.pk))
+
+
+def conditional_content(namespace="lesson"):
+    """
+    Условный GET для эндпоинтов контента: сильный ETag из версии контента,
+    версии прогресса и доступа пользователя. На совпавший If-None-Match
+    отвечает 304 до выполнения метода - без запросов к БД и сериализации.
+    Last-Modified отдаётся для сведения, If-Modified-Since не учитывается:
+    у даты секундная точность, и правка в ту же секунду дала бы устаревший 304,
+    а доступ пользователя в дату не входит.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            content_version = get_content_version(namespace)
+            progress_version = get_progress_version(request.user)
+            # Доступ входит в ETag: по окончании подписки закешированный
+            # клиентом платный урок не будет подтверждён ответом 304
+            full_access = has_full_access(request.user)
+            etag = '"%s"' % hashlib.sha1(
+                f"{namespace}:{content_version}:{request.user.pk}:{progress_version}:{full_access}:"
+                f"{request.build_absolute_uri()}".encode()
+            ).hexdigest()
+            last_modified = max(content_version, progress_version) // 1000
+
+            if_none_match = request.headers.get("If-None-Match")
+            not_modified = bool(if_none_match) and etag in [
+                tag.removeprefix("W/") for tag in parse_etags(if_none_match)
+            ]
+
+            if not_modified:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            patch_vary_headers(response, ["Authorization"])
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def get_snapshot(kind, key, request, builder, namespace="lesson"):
+    """
+    Возвращает не зависящую от пользователя часть ответа из кеша,
+    при промахе строит её через builder(). Ключ включает версию контента,
+    поэтому после любого изменения контента снапшоты перестраиваются.
+    Хост входит в ключ, так как в снапшоте лежат абсолютные URL файлов.
+    """
+    host = hashlib.md5(request.build_absolute_uri("/").encode()).hexdigest()[:12]
+    cache_key = SNAPSHOT_KEY.format(
+        kind=kind, key=key, version=get_content_version(namespace), host=host
+    )
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        snapshot = builder()
+        cache.set(cache_key, snapshot, settings.CONTENT_SNAPSHOT_TIMEOUT)
+    return snapshot
@@ -0,0 +1,186 @@
+from django.db.models import Prefetch
+
+from lesson.models import (
+    Module, Video, Watermark, DictionaryItem,
+    ModuleBlockDone, LessonItemFavoriteItem, DictionaryItemFavorite,
+)
+
+
+def file_url(request, field):
+    """Абсолютный URL файла (как FileField в DRF) или None"""
+    if not field:
+        return None
+    url = field.url
+    return request.build_absolute_uri(url) if request else url
+
+
+def module_payload_queryset():
+    """
+    Модуль со всем деревом за фиксированное число запросов:
+    module+lesson+level+course, blocks, videos, phrases, watermarks, items,
+    dictionary groups, dictionary items.
+    """
+    return (
+        Module.objects
+        .select_related("lesson__level__course")
+        .prefetch_related(
+            "blocks",
+            Prefetch("blocks__videos", queryset=Video.objects.order_by("id")),
+            "blocks__videos__phrases",
+            Prefetch("blocks__videos__watermarks", queryset=Watermark.objects.order_by("id")),
+            "blocks__items",
+            Prefetch("module_dictionary_groups__items", queryset=DictionaryItem.objects.order_by("id")),
+        )
+    )
+
+
+def load_module_user_state(module, user):
+    """Множества id выполненных блоков и избранного пользователя внутри модуля"""
+    if not user.is_authenticated:
+        return {"done_blocks": set(), "liked_items": set(), "favorite_words": set()}
+
+    return {
+        "done_blocks": set(
+            ModuleBlockDone.objects
+            .filter(user=user, module_block__module=module)
+            .values_list("module_block_id", flat=True)
+        ),
+        "liked_items": set(
+            LessonItemFavoriteItem.objects
+            .filter(user=user, lesson_item__block__module=module)
+            .values_list("lesson_item_id", flat=True)
+        ),
+        "favorite_words": set(
+            DictionaryItemFavorite.objects
+            .filter(user=user, dictionary_item__group__module=module)
+            .values_list("dictionary_item_id", flat=True)
+        ),
+    }
+
+
+def phrase_payload(phrase, request):
+    return {
+        "id": phrase.id,
+        "start_time": phrase.start_time,
+        "end_time": phrase.end_time,
+        "text_en": phrase.text_en,
+        "text_ru": phrase.text_ru,
+        "sound": phrase.sound,
+        "file": file_url(request, phrase.file),
+    }
+
+
+def watermark_payload(watermark):
+    return {
+        "start_time": watermark.start_time,
+        "end_time": watermark.end_time,
+        "text": watermark.text,
+    }
+
+
+_VIDEO_FIELDS = {
+    "id": lambda video, request: video.id,
+    "video_src": lambda video, request: video.video_src,
+    "phrases": lambda video, request: [phrase_payload(p, request) for p in video.phrases.all()],
+    "watermarks": lambda video, request: [watermark_payload(w) for w in video.watermarks.all()],
+    "file": lambda video, request: file_url(request, video.file),
+    "video_number": lambda video, request: video.video_number,
+}
+
+VIDEO_FIELDS = tuple(_VIDEO_FIELDS)
+
+
+def video_payload(video, request, fields=VIDEO_FIELDS):
+    """JSON видео в формате VideoSerializer; fields - подмножество VIDEO_FIELDS"""
+    return {name: _VIDEO_FIELDS[name](video, request) for name in fields}
+
+
+def lesson_videos_queryset(lesson, fields=VIDEO_FIELDS):
+    """Все видео урока одним запросом в порядке модуль → блок → видео"""
+    qs = (
+        Video.objects
+        .filter(block__module__lesson=lesson)
+        .order_by("block__module__sorting", "block__module_id", "block__sorting", "block_id", "id")
+    )
+    if "phrases" in fields:
+        qs = qs.prefetch_related("phrases")
+    if "watermarks" in fields:
+        qs = qs.prefetch_related(Prefetch("watermarks", queryset=Watermark.objects.order_by("id")))
+    return qs
+
+
+def build_module_payload(module, request):
+    """
+    Собирает JSON модуля (тот же формат, что у ModuleSerializer) из модуля,
+    полученного через module_payload_queryset(), без вложенных DRF-сериализаторов.
+    Пользовательские флаги выставлены в False - их проставляет apply_module_state().
+    """
+    blocks = []
+    for block in module.blocks.all():
+        blocks.append({
+            "id": block.id,
+            "sorting": block.sorting,
+            "caption": block.caption,
+            "type3_content": block.type3_content,
+            "videos": [video_payload(v, request) for v in block.videos.all()],
+            "items": [
+                {
+                    "id": item.id,
+                    "text_ru": item.text_ru,
+                    "text_en": item.text_en,
+                    "file": file_url(request, item.file),
+                    "is_like": False,
+                }
+                for item in block.items.all()
+            ],
+            "is_done": False,
+            "can_be_done": block.can_be_done,
+        })
+
+    groups = [
+        {
+            "id": group.id,
+            "title": group.title,
+            "items": [
+                {
+                    "id": item.id,
+                    "text_ru": item.text_ru,
+                    "text_en": item.text_en,
+                    "sound": item.sound,
+                    "is_favorite": False,
+                    "file": file_url(request, item.file),
+                }
+                for item in group.items.all()
+            ],
+        }
+        for group in module.module_dictionary_groups.all()
+    ]
+
+    return {
+        "id": module.id,
+        "title": module.title,
+        "index": module.index,
+        "url": module.url,
+        "sorting": module.sorting,
+        "blocks": blocks,
+        "lesson_mp3": module.lesson.mp3,
+        "is_done": False,
+        "module_dictionary_groups": groups,
+    }
+
+
+def apply_module_state(payload, state):
+    """Проставляет is_done/is_like/is_favorite из load_module_user_state()"""
+    done_blocks = state["done_blocks"]
+    liked_items = state["liked_items"]
+    favorite_words = state["favorite_words"]
+
+    for block in payload["blocks"]:
+        block["is_done"] = block["id"] in done_blocks
+        for item in block["items"]:
+            item["is_like"] = item["id"] in liked_items
+    for group in payload["module_dictionary_groups"]:
+        for item in group["items"]:
+            item["is_favorite"] = item["id"] in favorite_words
+    payload["is_done"] = bool(payload["blocks"]) and all(b["is_done"] for b in payload["blocks"])
+    return payload
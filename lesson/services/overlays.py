@@ -0,0 +1,100 @@
+"""
+Пользовательские поля (progress, is_done, is_favorite, is_like) поверх
+закешированных снапшотов контента. Каждая функция - не больше одного-двух
+запросов к сводным таблицам независимо от размера снапшота.
+"""
+from django.db.models import Count
+
+from lesson.models import (
+    LessonProgress, LevelProgress, ModuleBlockDone, DictionaryItemFavorite,
+)
+from user.services.entitlements import has_full_access
+
+
+def _percent(done, total):
+    # Счётчик может обогнать total, пока структуру урока не пересчитали
+    return min(done, total) * 100 // total if total else 0
+
+
+def overlay_levels(levels, user):
+    """levels - данные LevelShortSerializer"""
+    if not user.is_authenticated or not levels:
+        return
+    done = dict(
+        LevelProgress.objects
+        .filter(user=user, level_id__in=[level["id"] for level in levels])
+        .values_list("level_id", "done_lessons")
+    )
+    for level in levels:
+        done_lessons = done.get(level["id"], 0)
+        total = level["lessons_count"]
+        level["done_lessons_count"] = done_lessons
+        level["progress"] = _percent(done_lessons, total)
+        level["is_done"] = bool(total) and done_lessons >= total
+
+
+def overlay_lessons(lessons, total_blocks, user):
+    """lessons - данные LessonShortSerializer/LessonSerializer, total_blocks - {lesson_id: блоков}"""
+    if not user.is_authenticated or not lessons:
+        return
+    done = dict(
+        LessonProgress.objects
+        .filter(user=user, lesson_id__in=[lesson["id"] for lesson in lessons])
+        .values_list("lesson_id", "done_blocks")
+    )
+    for lesson in lessons:
+        done_blocks = done.get(lesson["id"], 0)
+        total = total_blocks.get(lesson["id"], 0)
+        lesson["progress"] = _percent(done_blocks, total)
+        lesson["is_done"] = bool(total) and done_blocks >= total
+
+
+def overlay_lesson_details(lessons, module_blocks, user):
+    """Модули (is_done) и словарь (is_favorite) внутри данных LessonSerializer"""
+    if not user.is_authenticated or not lessons:
+        return
+    lesson_ids = [lesson["id"] for lesson in lessons]
+    done_by_module = dict(
+        ModuleBlockDone.objects
+        .filter(user=user, module_block__module__lesson_id__in=lesson_ids)
+        .values("module_block__module_id")
+        .annotate(done=Count("module_block", distinct=True))
+        .values_list("module_block__module_id", "done")
+    )
+    favorites = set(
+        DictionaryItemFavorite.objects
+        .filter(user=user, dictionary_item__group__lesson_id__in=lesson_ids)
+        .values_list("dictionary_item_id", flat=True)
+    )
+    for lesson in lessons:
+        for module in lesson["modules"]:
+            total = module_blocks.get(module["id"], 0)
+            module["is_done"] = bool(total) and done_by_module.get(module["id"], 0) >= total
+        for group in lesson["dictionary_groups"]:
+            for item in group["items"]:
+                item["is_favorite"] = item["id"] in favorites
+
+
+def overlay_locks(lessons, user, is_free=None):
+    """
+    locked - урок платный, а полного доступа у пользователя нет.
+    is_free - {lesson_id: bool}, если в данных урока нет поля is_free
+    """
+    full_access = has_full_access(user)
+    for lesson in lessons:
+        free = lesson["is_free"] if is_free is None else is_free.get(lesson["id"], False)
+        lesson["locked"] = not (free or full_access)
+
+
+# Платное содержимое урока в данных LessonSerializer
+PAID_LESSON_FIELDS = (
+    "mp3", "file", "table_file", "dictionary_groups", "orthography_items", "orthography_description",
+)
+
+
+def hide_locked_content(lessons):
+    """Убирает платное содержимое из уроков, помеченных overlay_locks как locked"""
+    for lesson in lessons:
+        if lesson["locked"]:
+            for field in PAID_LESSON_FIELDS:
+                lesson.pop(field, None)
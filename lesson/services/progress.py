@@ -0,0 +1,303 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from lesson.models import (
+    Level, Lesson, ModuleBlock, ModuleBlockDone, LessonDone,
+    LessonProgress, LevelProgress, CourseProgress,
+)
+
+
+def _bump(model, field, delta, **lookup):
+    """Атомарно прибавляет delta к счётчику строки сводной таблицы"""
+    if not delta:
+        return
+    obj, _ = model.objects.get_or_create(**lookup)
+    model.objects.filter(pk=obj.pk).update(**{field: F(field) + delta})
+
+
+def block_lessons(block_ids):
+    """{block_id: урок блока} - id, кешированное число блоков, уровень и курс урока"""
+    rows = ModuleBlock.objects.filter(pk__in=block_ids).values(
+        'id',
+        lesson_id=F('module__lesson_id'),
+        blocks_count=F('module__lesson__blocks_count'),
+        level_id=F('module__lesson__level_id'),
+        course_id=F('module__lesson__level__course_id'),
+    )
+    return {row.pop('id'): row for row in rows}
+
+
+def _lesson_done_changed(user, lesson, delta):
+    _bump(LevelProgress, 'done_lessons', delta, user=user, level_id=lesson['level_id'])
+    _bump(CourseProgress, 'done_lessons', delta, user=user, course_id=lesson['course_id'])
+
+
+def apply_lesson_delta(user, lesson, delta):
+    """
+    Прибавляет delta к числу выполненных блоков урока и переключает LessonDone,
+    когда счётчик пересекает Lesson.blocks_count. Несколько однострочных
+    запросов вместо агрегата по всем блокам урока.
+    """
+    if not delta:
+        return
+    with transaction.atomic():
+        progress, _ = LessonProgress.objects.select_for_update().get_or_create(
+            user=user, lesson_id=lesson['lesson_id']
+        )
+        total = lesson['blocks_count']
+        was_done = total > 0 and progress.done_blocks >= total
+        progress.done_blocks = max(progress.done_blocks + delta, 0)
+        progress.save(update_fields=['done_blocks'])
+        now_done = total > 0 and progress.done_blocks >= total
+
+        if now_done and not was_done:
+            _, created = LessonDone.objects.get_or_create(user=user, lesson_id=lesson['lesson_id'])
+            if created:
+                _lesson_done_changed(user, lesson, 1)
+        elif was_done and not now_done:
+            deleted, _ = LessonDone.objects.filter(user=user, lesson_id=lesson['lesson_id']).delete()
+            if deleted:
+                _lesson_done_changed(user, lesson, -1)
+
+
+def toggle_block_done(user, block_id):
+    """
+    Отмечает блок выполненным или снимает отметку.
+    Возвращает новое состояние блока или None, если блока нет.
+    """
+    lesson = block_lessons([block_id]).get(block_id)
+    if lesson is None:
+        return None
+    with transaction.atomic():
+        obj, created = ModuleBlockDone.objects.get_or_create(user=user, module_block_id=block_id)
+        if created:
+            delta = 1
+        else:
+            # Параллельный запрос мог удалить отметку раньше - считаем только своё удаление
+            deleted, _ = ModuleBlockDone.objects.filter(pk=obj.pk).delete()
+            delta = -deleted
+        apply_lesson_delta(user, lesson, delta)
+    return created
+
+
+def sync_blocks_done(user, states):
+    """
+    Выставляет состояния блоков: states - {block_id: done}. В отличие от
+    toggle_block_done это не переключение, поэтому повторная отправка той же
+    пачки (офлайн-клиент) ничего не меняет. Вставки и удаления - по одному
+    запросу, прогресс уроков пересчитывается один раз на урок.
+    Счётчики двигаются только на строки, которые вставил или удалил именно этот
+    запрос (RETURNING), поэтому параллельные синхронизации не считают блок дважды.
+    Возвращает (отмечено, снято, неизвестные id).
+    """
+    lessons = block_lessons(list(states))
+    unknown = sorted(set(states) - set(lessons))
+    to_create = [block_id for block_id in lessons if states[block_id]]
+    to_delete = [block_id for block_id in lessons if not states[block_id]]
+
+    table = connection.ops.quote_name(ModuleBlockDone._meta.db_table)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            created = []
+            if to_create:
+                cursor.execute(
+                    f"INSERT INTO {table} (user_id, module_block_id) "
+                    f"SELECT %s, unnest(%s::bigint[]) "
+                    f"ON CONFLICT (user_id, module_block_id) DO NOTHING RETURNING module_block_id",
+                    [user.pk, to_create],
+                )
+                created = [row[0] for row in cursor.fetchall()]
+            deleted = []
+            if to_delete:
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE user_id = %s AND module_block_id = ANY(%s::bigint[]) "
+                    f"RETURNING module_block_id",
+                    [user.pk, to_delete],
+                )
+                deleted = [row[0] for row in cursor.fetchall()]
+
+        deltas = {}
+        for block_ids, sign in ((created, 1), (deleted, -1)):
+            for block_id in block_ids:
+                lesson = lessons[block_id]
+                deltas.setdefault(lesson['lesson_id'], [lesson, 0])[1] += sign
+        for lesson, delta in deltas.values():
+            apply_lesson_delta(user, lesson, delta)
+
+    return len(created), len(deleted), unknown
+
+
+def recount_lesson_blocks(lesson_ids=None):
+    """Пересчитывает кеш Lesson.blocks_count"""
+    counts = (
+        ModuleBlock.objects
+        .filter(module__lesson=OuterRef('pk'))
+        .order_by()
+        .values('module__lesson')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    lessons = Lesson.objects.all()
+    if lesson_ids is not None:
+        lessons = lessons.filter(pk__in=lesson_ids)
+    return lessons.update(blocks_count=Coalesce(Subquery(counts), Value(0), output_field=IntegerField()))
+
+
+def recount_lesson_structure(lesson_ids):
+    """
+    После добавления/удаления блоков урока: blocks_count, LessonProgress.done_blocks
+    (отметки удалённых блоков ушли каскадом), LessonDone по новому числу блоков
+    и счётчики уровней/курсов. Затрагивает всех пользователей урока - только для
+    правок контента, не для запросов пользователей.
+    """
+    lesson_ids = list(lesson_ids)
+    if not lesson_ids:
+        return
+    with transaction.atomic():
+        recount_lesson_blocks(lesson_ids)
+
+        done_counts = (
+            ModuleBlockDone.objects
+            .filter(user=OuterRef('user_id'), module_block__module__lesson=OuterRef('lesson_id'))
+            .order_by()
+            .values('user')
+            .annotate(total=Count('module_block', distinct=True))
+            .values('total')
+        )
+        progress = LessonProgress.objects.filter(lesson_id__in=lesson_ids)
+        progress.update(done_blocks=Coalesce(Subquery(done_counts), Value(0), output_field=IntegerField()))
+
+        complete = progress.filter(lesson__blocks_count__gt=0, done_blocks__gte=F('lesson__blocks_count'))
+        LessonDone.objects.filter(lesson_id__in=lesson_ids).exclude(
+            Exists(complete.filter(user=OuterRef('user'), lesson=OuterRef('lesson')))
+        ).delete()
+        LessonDone.objects.bulk_create([
+            LessonDone(user_id=user_id, lesson_id=lesson_id)
+            for user_id, lesson_id in complete.exclude(
+                Exists(LessonDone.objects.filter(user=OuterRef('user'), lesson=OuterRef('lesson')))
+            ).values_list('user_id', 'lesson_id')
+        ])
+
+        recount_level_progress(Lesson.objects.filter(pk__in=lesson_ids).values_list('level_id', flat=True))
+
+
+_state = threading.local()
+
+
+def _pending_lessons():
+    if not hasattr(_state, "lessons"):
+        _state.lessons = set()
+    return _state.lessons
+
+
+def mark_lessons_changed(lesson_ids):
+    """
+    Отмечает уроки, у которых изменился состав блоков; recount_lesson_structure -
+    один раз на урок после коммита текущей транзакции
+    """
+    _pending_lessons().update(lesson_id for lesson_id in lesson_ids if lesson_id is not None)
+    if getattr(_state, "batch_depth", 0):
+        return
+    # Как в search.services.documents: колбэки откатившейся транзакции теряются,
+    # а повторный сброс пустого набора ничего не делает
+    transaction.on_commit(flush_lesson_changes)
+
+
+@contextmanager
+def batch_lesson_changes():
+    """Массовая загрузка (import_course): один пересчёт уроков при выходе из блока"""
+    _state.batch_depth = getattr(_state, "batch_depth", 0) + 1
+    try:
+        yield
+    finally:
+        _state.batch_depth -= 1
+        if not _state.batch_depth and _pending_lessons():
+            transaction.on_commit(flush_lesson_changes)
+
+
+def flush_lesson_changes():
+    pending = _pending_lessons()
+    if not pending:
+        return
+    lesson_ids = set(pending)
+    pending.clear()
+    recount_lesson_structure(lesson_ids)
+
+
+def recount_level_progress(level_ids):
+    """Пересчитывает LevelProgress уровней и CourseProgress их курсов из LessonDone"""
+    level_ids = list(level_ids)
+    course_ids = list(Level.objects.filter(pk__in=level_ids).values_list('course_id', flat=True).distinct())
+    lessons_done = LessonDone.objects.filter(user__isnull=False, lesson__isnull=False)
+    with transaction.atomic():
+        _rebuild(
+            LevelProgress, 'done_lessons', lessons_done.filter(lesson__level_id__in=level_ids),
+            'lesson__level_id', 'level_id', Count('lesson', distinct=True), level_id__in=level_ids,
+        )
+        _rebuild(
+            CourseProgress, 'done_lessons', lessons_done.filter(lesson__level__course_id__in=course_ids),
+            'lesson__level__course_id', 'course_id', Count('lesson', distinct=True), course_id__in=course_ids,
+        )
+
+
+def _rebuild(model, counter_field, source_qs, group_field, target_field, counter, batch_size=1000, **scope):
+    """Удаляет строки model в scope и создаёт заново из агрегата source_qs"""
+    model.objects.filter(**scope).delete()
+
+    rows = (
+        source_qs
+        .values('user_id', group_field)
+        .annotate(total=counter)
+        .order_by()
+    )
+    batch = []
+    created = 0
+    for row in rows.iterator():
+        batch.append(model(**{
+            'user_id': row['user_id'],
+            target_field: row[group_field],
+            counter_field: row['total'],
+        }))
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def rebuild_progress(user_ids=None, batch_size=1000):
+    """
+    Полностью пересчитывает Lesson.blocks_count и сводные таблицы прогресса
+    из ModuleBlockDone/LessonDone. Возвращает количество созданных строк по каждой таблице.
+    """
+    blocks_done = ModuleBlockDone.objects.filter(user__isnull=False, module_block__isnull=False)
+    lessons_done = LessonDone.objects.filter(user__isnull=False, lesson__isnull=False)
+    scope = {}
+    if user_ids:
+        blocks_done = blocks_done.filter(user_id__in=user_ids)
+        lessons_done = lessons_done.filter(user_id__in=user_ids)
+        scope = {'user_id__in': user_ids}
+
+    with transaction.atomic():
+        recount_lesson_blocks()
+        return {
+            'lessons': _rebuild(
+                LessonProgress, 'done_blocks', blocks_done, 'module_block__module__lesson_id', 'lesson_id',
+                Count('module_block', distinct=True), batch_size, **scope,
+            ),
+            'levels': _rebuild(
+                LevelProgress, 'done_lessons', lessons_done, 'lesson__level_id', 'level_id',
+                Count('lesson', distinct=True), batch_size, **scope,
+            ),
+            'courses': _rebuild(
+                CourseProgress, 'done_lessons', lessons_done, 'lesson__level__course_id', 'course_id',
+                Count('lesson', distinct=True), batch_size, **scope,
+            ),
+        }
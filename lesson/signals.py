@@ -0,0 +1,63 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from lesson.models import (
+    Course, Level, Lesson, LessonTable, Module, ModuleBlock, LessonItem,
+    Video, Phrase, Watermark, DictionaryGroup, DictionaryItem, OrthographyItem,
+)
+from lesson.services.content_cache import bump_content_version
+from lesson.services.progress import mark_lessons_changed, recount_level_progress
+
+# Изменение любой из этих моделей (админка, import_course) инвалидирует снапшоты контента
+CONTENT_MODELS = (
+    Course, Level, Lesson, LessonTable, Module, ModuleBlock, LessonItem,
+    Video, Phrase, Watermark, DictionaryGroup, DictionaryItem, OrthographyItem,
+)
+
+
+def content_changed(sender, **kwargs):
+    bump_content_version("lesson")
+
+
+for model in CONTENT_MODELS:
+    post_save.connect(content_changed, sender=model, dispatch_uid=f"content_changed_save_{model.__name__}")
+    post_delete.connect(content_changed, sender=model, dispatch_uid=f"content_changed_delete_{model.__name__}")
+
+
+def _block_lesson(module_id):
+    return Module.objects.filter(pk=module_id).values_list('lesson_id', flat=True).first()
+
+
+def module_block_moving(sender, instance, raw=False, **kwargs):
+    # Перенос блока в модуль другого урока: запоминаем старый урок, его
+    # blocks_count и прогресс тоже меняются
+    instance._previous_lesson_id = None
+    if raw or instance._state.adding:
+        return
+    instance._previous_lesson_id = (
+        ModuleBlock.objects.filter(pk=instance.pk).exclude(module_id=instance.module_id)
+        .values_list('module__lesson_id', flat=True).first()
+    )
+
+
+def module_block_saved(sender, instance, created, raw=False, **kwargs):
+    previous_lesson_id = getattr(instance, '_previous_lesson_id', None)
+    if raw or not (created or previous_lesson_id):
+        # Правка блока без переноса число блоков урока не меняет
+        return
+    mark_lessons_changed([previous_lesson_id, _block_lesson(instance.module_id)])
+
+
+def module_block_deleted(sender, instance, **kwargs):
+    # ModuleBlockDone удалённого блока ушли каскадом без пересчёта счётчиков
+    mark_lessons_changed([_block_lesson(instance.module_id)])
+
+
+def lesson_deleted(sender, instance, **kwargs):
+    # LessonDone урока удалены каскадом - пересчитываем уровень и курс
+    recount_level_progress([instance.level_id])
+
+
+pre_save.connect(module_block_moving, sender=ModuleBlock, dispatch_uid="module_block_moving")
+post_save.connect(module_block_saved, sender=ModuleBlock, dispatch_uid="module_blocks_changed_save")
+post_delete.connect(module_block_deleted, sender=ModuleBlock, dispatch_uid="module_blocks_changed_delete")
+post_delete.connect(lesson_deleted, sender=Lesson, dispatch_uid="lesson_progress_deleted")
@@ -1,3 +1,402 @@
-from django.test import TestCase
+import threading
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from lesson.models import (
+    Course, Level, Lesson, Module, ModuleBlock, ModuleBlockDone,
+    Video, Phrase, Watermark, LessonItem,
+    LessonDone, LessonProgress, LevelProgress, CourseProgress,
+)
+from lesson.services import progress
+from lesson.services.progress import rebuild_progress, sync_blocks_done, toggle_block_done
+from ucanspeack_api.checks import check_shared_cache
+from user.models import User, UserToken
+from user.services.entitlements import update_users
+
+
+class ModuleRetrieveQueriesTest(TestCase):
+    def setUp(self):
+        course = Course.objects.create(title="Course", slug="course")
+        level = Level.objects.create(course=course, title="Level", slug="level")
+        lesson = Lesson.objects.create(level=level, title="Lesson", slug="lesson")
+        self.module = Module.objects.create(lesson=lesson, title="Module", index="1")
+
+        self.user = User.objects.create_user(
+            email="pupil@example.com", password="secret",
+            subscription_expire=date.today() + timedelta(days=30),
+        )
+        token = UserToken.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        # Прогрев кеша токенов, чтобы замеры отличались только числом блоков
+        self.client.get(f"/api/lesson/modules/{self.module.id}/")
+
+    def add_blocks(self, count):
+        for i in range(count):
+            block = ModuleBlock.objects.create(module=self.module, sorting=i, caption="caption")
+            video = Video.objects.create(block=block, video_number=str(i), file="lessons/module/video/v.mp4")
+            Phrase.objects.create(video=video, text_en="hello", text_ru="привет")
+            Watermark.objects.create(video=video, text="wm")
+            LessonItem.objects.create(block=block, text_en="item", text_ru="элемент")
+            if i % 2:
+                ModuleBlockDone.objects.create(user=self.user, module_block=block)
+
+    def retrieve(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f"/api/lesson/modules/{self.module.id}/")
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_query_count_does_not_depend_on_blocks(self):
+        self.add_blocks(2)
+        data, small = self.retrieve()
+        self.assertEqual([b["is_done"] for b in data["blocks"]], [False, True])
+
+        self.add_blocks(8)
+        data, large = self.retrieve()
+        self.assertEqual(len(data["blocks"]), 10)
+        self.assertEqual(small, large)
+
+    def list_modules(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/lesson/modules/")
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_list_resolves_is_done_without_per_block_queries(self):
+        self.add_blocks(2)
+        data, small = self.list_modules()
+        self.assertEqual([b["is_done"] for b in data[0]["blocks"]], [False, True])
+
+        self.add_blocks(8)
+        data, large = self.list_modules()
+        self.assertEqual(len(data[0]["blocks"]), 10)
+        self.assertEqual(small, large)
+
+
+def create_pupil(email="pupil@example.com"):
+    return User.objects.create_user(
+        email=email, password="secret",
+        subscription_expire=date.today() + timedelta(days=30),
+    )
+
+
+class ProgressTestCase(TestCase):
+    def setUp(self):
+        course = Course.objects.create(title="Course", slug="course")
+        self.level = Level.objects.create(course=course, title="Level", slug="level")
+        self.lesson, self.blocks = self.create_lesson("lesson")
+        self.user = create_pupil()
+
+    def create_lesson(self, slug, blocks=3):
+        # Состав блоков пересчитывается после коммита
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = Lesson.objects.create(level=self.level, title=slug, slug=slug)
+            module = Module.objects.create(lesson=lesson, title="Module", index="1")
+            return lesson, [
+                ModuleBlock.objects.create(module=module, sorting=i, caption="caption")
+                for i in range(blocks)
+            ]
+
+    def complete(self, blocks):
+        for block in blocks:
+            toggle_block_done(self.user, block.id)
+
+    def counters(self, lesson=None):
+        lesson = lesson or self.lesson
+        return {
+            "blocks_count": Lesson.objects.get(pk=lesson.pk).blocks_count,
+            "done_blocks": LessonProgress.objects.filter(user=self.user, lesson=lesson)
+            .values_list("done_blocks", flat=True).first() or 0,
+            "lesson_done": LessonDone.objects.filter(user=self.user, lesson=lesson).count(),
+            "level_done": LevelProgress.objects.filter(user=self.user, level=self.level)
+            .values_list("done_lessons", flat=True).first() or 0,
+            "course_done": CourseProgress.objects.filter(user=self.user, course=self.level.course)
+            .values_list("done_lessons", flat=True).first() or 0,
+        }
+
+    def assertMatchesRebuild(self, lesson=None):
+        """Инкрементальные счётчики совпадают с полным пересчётом"""
+        counters = self.counters(lesson)
+        rebuild_progress()
+        self.assertEqual(counters, self.counters(lesson))
+        return counters
+
+
+class ProgressRollupTest(ProgressTestCase):
+    def test_completed_lesson_counts_for_level_and_course(self):
+        self.complete(self.blocks)
+        self.assertEqual(self.assertMatchesRebuild(), {
+            "blocks_count": 3, "done_blocks": 3, "lesson_done": 1, "level_done": 1, "course_done": 1,
+        })
+
+    def test_deleting_done_block_keeps_counters(self):
+        self.complete(self.blocks)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blocks[0].delete()
+        self.assertEqual(self.assertMatchesRebuild(), {
+            "blocks_count": 2, "done_blocks": 2, "lesson_done": 1, "level_done": 1, "course_done": 1,
+        })
+
+    def test_deleting_last_undone_block_completes_lesson(self):
+        self.complete(self.blocks[:2])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blocks[2].delete()
+        self.assertEqual(self.assertMatchesRebuild()["level_done"], 1)
+
+    def test_new_block_reopens_lesson(self):
+        self.complete(self.blocks)
+        with self.captureOnCommitCallbacks(execute=True):
+            ModuleBlock.objects.create(module=self.blocks[0].module, sorting=10, caption="caption")
+        self.assertEqual(self.assertMatchesRebuild(), {
+            "blocks_count": 4, "done_blocks": 3, "lesson_done": 0, "level_done": 0, "course_done": 0,
+        })
+
+    def test_moving_block_recounts_both_lessons(self):
+        other, other_blocks = self.create_lesson("other", blocks=1)
+        self.complete(self.blocks[:2] + other_blocks)
+        with self.captureOnCommitCallbacks(execute=True):
+            block = self.blocks[2]
+            block.module = other_blocks[0].module
+            block.save()
+        self.assertEqual(self.counters()["lesson_done"], 1)
+        self.assertEqual(self.counters(other)["done_blocks"], 1)
+        self.assertEqual(self.assertMatchesRebuild(other)["blocks_count"], 2)
+        self.assertEqual(self.assertMatchesRebuild()["level_done"], 1)
+
+    def test_module_delete_recounts_lesson_once(self):
+        with mock.patch.object(progress, "recount_lesson_structure", wraps=progress.recount_lesson_structure) as recount:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.blocks[0].module.delete()
+        recount.assert_called_once_with({self.lesson.id})
+        self.assertEqual(self.counters()["blocks_count"], 0)
+
+    def test_deleting_lesson_recounts_level(self):
+        other, blocks = self.create_lesson("other", blocks=1)
+        self.complete(self.blocks + blocks)
+        self.assertEqual(self.counters()["level_done"], 2)
+        other.delete()
+        self.assertEqual(self.assertMatchesRebuild()["level_done"], 1)
+
+
+class ToggleBlockTest(ProgressTestCase):
+    def test_toggle_completes_and_reopens_lesson(self):
+        self.complete(self.blocks[1:])
+        self.assertIs(toggle_block_done(self.user, self.blocks[0].id), True)
+        self.assertEqual(self.counters()["lesson_done"], 1)
+        self.assertIs(toggle_block_done(self.user, self.blocks[0].id), False)
+        self.assertEqual(self.assertMatchesRebuild(), {
+            "blocks_count": 3, "done_blocks": 2, "lesson_done": 0, "level_done": 0, "course_done": 0,
+        })
+
+    def test_unknown_block(self):
+        self.assertIsNone(toggle_block_done(self.user, 0))
+        self.assertFalse(LessonProgress.objects.exists())
+
+
+class SyncBlocksTest(ProgressTestCase):
+    def test_sync_completes_lesson(self):
+        self.assertEqual(sync_blocks_done(self.user, {block.id: True for block in self.blocks}), (3, 0, []))
+        self.assertEqual(self.assertMatchesRebuild()["level_done"], 1)
+
+    def test_repeated_sync_changes_nothing(self):
+        states = {block.id: True for block in self.blocks[:2]}
+        sync_blocks_done(self.user, states)
+        self.assertEqual(sync_blocks_done(self.user, states), (0, 0, []))
+        self.assertEqual(self.assertMatchesRebuild()["done_blocks"], 2)
+
+    def test_sync_unmarks_blocks(self):
+        self.complete(self.blocks)
+        self.assertEqual(sync_blocks_done(self.user, {self.blocks[0].id: False}), (0, 1, []))
+        self.assertEqual(self.assertMatchesRebuild()["lesson_done"], 0)
+
+    def test_sync_reports_unknown_blocks(self):
+        self.assertEqual(sync_blocks_done(self.user, {self.blocks[0].id: True, 0: True}), (1, 0, [0]))
+
+    def test_duplicate_block_done_rejected(self):
+        ModuleBlockDone.objects.create(user=self.user, module_block=self.blocks[0])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ModuleBlockDone.objects.create(user=self.user, module_block=self.blocks[0])
+
+
+class ConcurrentSyncTest(TransactionTestCase):
+    """Параллельная отправка одной пачки не считает блоки дважды"""
+
+    def test_parallel_sync_counts_each_block_once(self):
+        course = Course.objects.create(title="Course", slug="course")
+        level = Level.objects.create(course=course, title="Level", slug="level")
+        lesson = Lesson.objects.create(level=level, title="Lesson", slug="lesson")
+        module = Module.objects.create(lesson=lesson, title="Module", index="1")
+        blocks = [ModuleBlock.objects.create(module=module, sorting=i, caption="caption") for i in range(3)]
+        user = create_pupil()
+        states = {block.id: True for block in blocks}
+        barrier = threading.Barrier(3)
+        results = []
+
+        def sync():
+            try:
+                barrier.wait()
+                results.append(sync_blocks_done(user, states))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=sync) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(done for done, _, _ in results), 3)
+        self.assertEqual(LessonProgress.objects.get(user=user, lesson=lesson).done_blocks, 3)
+        self.assertEqual(LessonDone.objects.filter(user=user, lesson=lesson).count(), 1)
+        self.assertEqual(LevelProgress.objects.get(user=user, level=level).done_lessons, 1)
+
+
+class ProgressOverlayTest(ProgressTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        token = UserToken.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_progress_is_capped(self):
+        self.complete(self.blocks)
+        # Счётчик может обогнать число блоков, пока урок не пересчитан
+        LessonProgress.objects.filter(lesson=self.lesson).update(done_blocks=5)
+        self.assertEqual(self.client.get(f"/api/lesson/lessons/{self.lesson.slug}/").json()["progress"], 100)
+
+    def test_toggle_block_validates_id(self):
+        response = self.client.post("/api/lesson/modules/toggle_block/", {"id": "abc"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/lesson/modules/toggle_block/", {"id": self.blocks[0].id}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counters()["done_blocks"], 1)
+
+
+class ContentSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        course = Course.objects.create(title="Course", slug="course")
+        level = Level.objects.create(course=course, title="Level", slug="level")
+        self.lesson = Lesson.objects.create(level=level, title="Lesson", slug="lesson", is_free=True)
+        self.client = APIClient()
+
+    def get_title(self):
+        return self.client.get(f"/api/lesson/lessons/{self.lesson.slug}/").json()["title"]
+
+    def test_content_change_rebuilds_snapshot(self):
+        self.assertEqual(self.get_title(), "Lesson")
+        self.lesson.title = "Renamed"
+        self.lesson.save()
+        self.assertEqual(self.get_title(), "Renamed")
+
+    def test_snapshot_is_served_from_cache(self):
+        self.get_title()
+        # update() не шлёт сигналов - версия контента прежняя, ответ из снапшота
+        Lesson.objects.filter(pk=self.lesson.pk).update(title="Renamed")
+        self.assertEqual(self.get_title(), "Lesson")
+
+    @override_settings(
+        WEB_CONCURRENCY=4,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    )
+    def test_process_local_cache_rejected_for_several_workers(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ["ucanspeack_api.E001"])
+
+
+class ConditionalContentTest(ProgressTestCase):
+    """ETag/304 для эндпоинтов контента"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = f"/api/lesson/lessons/{self.lesson.slug}/"
+        token = UserToken.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def get(self, **headers):
+        return self.client.get(self.url, **headers)
+
+    def test_matching_etag_returns_304(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=f"W/{etag}").status_code, 304)
+
+    def test_progress_change_invalidates_etag(self):
+        response = self.get()
+        self.assertEqual(response.json()["progress"], 0)
+
+        self.client.post("/api/lesson/modules/toggle_block/", {"id": self.blocks[0].id}, format="json")
+        response = self.get(HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["progress"], 33)
+
+    def test_content_change_invalidates_etag(self):
+        etag = self.get()["ETag"]
+        self.lesson.title = "Renamed"
+        self.lesson.save()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "Renamed")
+
+    def test_if_modified_since_is_ignored(self):
+        response = self.get()
+        # Правка в ту же секунду, что и Last-Modified прошлого ответа
+        self.client.post("/api/lesson/modules/toggle_block/", {"id": self.blocks[0].id}, format="json")
+        response = self.get(HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["progress"], 33)
+
+
+class LessonAccessTest(ProgressTestCase):
+    """Платные уроки без подписки: 403 даже по старому ETag, в списке - без содержимого"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.free_lesson, _ = self.create_lesson("free")
+        Lesson.objects.filter(pk=self.free_lesson.pk).update(is_free=True)
+        token = UserToken.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def expire_subscription(self):
+        update_users(User.objects.filter(pk=self.user.pk), subscription_expire=date.today() - timedelta(days=1))
+
+    def test_expired_subscription_ignores_old_etag(self):
+        url = f"/api/lesson/lessons/{self.lesson.slug}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.expire_subscription()
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response["ETag"], HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_list_hides_locked_content(self):
+        self.expire_subscription()
+        lessons = {lesson["slug"]: lesson for lesson in self.client.get("/api/lesson/lessons/").json()}
+
+        self.assertTrue(lessons[self.lesson.slug]["locked"])
+        self.assertFalse(lessons["free"]["locked"])
+        for field in ("mp3", "file", "table_file", "dictionary_groups", "orthography_items"):
+            self.assertNotIn(field, lessons[self.lesson.slug])
+            self.assertIn(field, lessons["free"])
+
+    def test_list_keeps_content_with_subscription(self):
+        lessons = self.client.get("/api/lesson/lessons/").json()
+        self.assertTrue(all("dictionary_groups" in lesson and not lesson["locked"] for lesson in lessons))
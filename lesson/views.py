@@ -1,13 +1,28 @@
 from rest_framework import viewsets, status, generics
 from rest_framework.response import Response
+from rest_framework.exceptions import PermissionDenied
 
-from user.models.school import School
+from user.services.context import get_user_context
+from user.services.entitlements import can_open_lesson
+from user.services.last_lesson import remember_last_lesson_url
+from ucanspeack_api.throttling import ToggleRateThrottle
 from .models import *
 from .serializers import *
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 
 from django.db.models import Count, Q, F, Case, When, Value, IntegerField, BooleanField, ExpressionWrapper, Prefetch, Exists, OuterRef
 
+from .services.progress import toggle_block_done, sync_blocks_done
+from .services.content_cache import get_snapshot, conditional_content, bump_progress_version
+from .services.overlays import (
+    overlay_levels, overlay_lessons, overlay_lesson_details, overlay_locks, hide_locked_content,
+)
+from .services.module_payload import (
+    module_payload_queryset, load_module_user_state, build_module_payload, apply_module_state,
+    VIDEO_FIELDS, video_payload, lesson_videos_queryset,
+)
+
 
 class DictionaryItemFavoriteListAPIView(generics.ListAPIView):
     serializer_class = DictionaryItemSerializer
@@ -19,13 +34,19 @@ class DictionaryItemFavoriteListAPIView(generics.ListAPIView):
             .annotate(is_favorite=Value(True, output_field=BooleanField()))
         )
 
+def check_lesson_access(user, is_free):
+    """Платный урок без подписки - 403 (доступ берётся из кеша, без запросов к БД)"""
+    if not can_open_lesson(user, is_free):
+        raise PermissionDenied("Урок доступен по подписке")
+
+
 class TariffsListAPIView(generics.ListAPIView):
     serializer_class = TariffSerializer
 
     def get_queryset(self):
         if not self.request.user.is_authenticated:
             return None
-        is_pupil = School.objects.filter(pupils=self.request.user).exists()
+        is_pupil = get_user_context(self.request.user).is_pupil
         return Tariff.objects.filter(is_for_school=is_pupil)
 
 class LessonItemFavoriteListAPIView(generics.ListAPIView):
@@ -44,70 +65,44 @@ class CourseViewSet(viewsets.ModelViewSet):
     lookup_field = 'slug'
 
     def get_queryset(self):
-        user = self.request.user
-
-        # Проверяем, залогинен ли пользователь
-        if user.is_authenticated:
-            # Для залогиненного пользователя - с прогрессом
-            levels_qs = Level.objects.annotate(
-                total_lessons=Count('lessons', distinct=True),
-                done_lessons_count=Count(
-                    'lessons__lessondone',
-                    filter=Q(lessons__lessondone__user=user),
-                    distinct=True
-                ),
-                progress=Case(
-                    When(total_lessons=0, then=Value(0)),
-                    default=ExpressionWrapper(
-                        F('done_lessons_count') * 100 / F('total_lessons'),
-                        output_field=IntegerField()
-                    ),
-                    output_field=IntegerField()
-                ),
-                is_done=Case(
-                    When(total_lessons=0, then=Value(False)),
-                    When(total_lessons=F('done_lessons_count'), then=Value(True)),
-                    default=Value(False),
-                    output_field=BooleanField()
-                )
-            ).order_by("order_num")
+        # Структура курса не зависит от пользователя и кешируется снапшотом,
+        # прогресс накладывается поверх в list/retrieve (overlay_levels)
+        levels_qs = Level.objects.annotate(
+            total_lessons=Count('lessons', distinct=True),
+            done_lessons_count=Value(0, output_field=IntegerField()),
+            progress=Value(0, output_field=IntegerField()),
+            is_done=Value(False, output_field=BooleanField())
+        ).order_by("order_num")
 
-            courses = Course.objects.annotate(
-                done_lessons_count=Count(
-                    'levels__lessons__lessondone',
-                    filter=Q(levels__lessons__lessondone__user=user),
-                    distinct=True
-                ),
-                total_lessons=Count('levels__lessons', distinct=True),
-                lessons_progress=Case(
-                    When(total_lessons=0, then=Value(0)),
-                    default=ExpressionWrapper(
-                        F('done_lessons_count') * 100 / F('total_lessons'),
-                        output_field=IntegerField()
-                    ),
-                    output_field=IntegerField()
-                )
-            ).prefetch_related(
-                Prefetch('levels', queryset=levels_qs)
-            )
-        else:
-            # Для незалогиненного пользователя - без прогресса
-            levels_qs = Level.objects.annotate(
-                total_lessons=Count('lessons', distinct=True),
-                done_lessons_count=Value(0, output_field=IntegerField()),
-                progress=Value(0, output_field=IntegerField()),
-                is_done=Value(False, output_field=BooleanField())
-            ).order_by("order_num")
-
-            courses = Course.objects.annotate(
-                done_lessons_count=Value(0, output_field=IntegerField()),
-                total_lessons=Count('levels__lessons', distinct=True),
-                lessons_progress=Value(0, output_field=IntegerField())
-            ).prefetch_related(
-                Prefetch('levels', queryset=levels_qs)
-            )
+        courses = Course.objects.annotate(
+            done_lessons_count=Value(0, output_field=IntegerField()),
+            total_lessons=Count('levels__lessons', distinct=True),
+            lessons_progress=Value(0, output_field=IntegerField())
+        ).prefetch_related(
+            Prefetch('levels', queryset=levels_qs)
+        )
 
         return courses
+
+    @conditional_content()
+    def list(self, request, *args, **kwargs):
+        courses = get_snapshot(
+            'courses', 'list', request,
+            lambda: self.get_serializer(self.get_queryset(), many=True).data
+        )
+        overlay_levels([level for course in courses for level in course['levels']], request.user)
+        return Response(courses)
+
+    @conditional_content()
+    def retrieve(self, request, *args, **kwargs):
+        course = get_snapshot(
+            'course', kwargs[self.lookup_field], request,
+            lambda: self.get_serializer(self.get_object()).data
+        )
+        overlay_levels(course['levels'], request.user)
+        return Response(course)
+
+
 class CourseViewSetOld(viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
@@ -171,78 +166,63 @@ class LevelViewSet(viewsets.ModelViewSet):
     lookup_field = 'slug'
 
     def get_queryset(self):
-        user = self.request.user
-
-        # ---------- Lessons queryset ----------
-        if user.is_authenticated:
-            lessons_qs = Lesson.objects.annotate(
-                total_blocks=Count('modules__blocks', distinct=True),
-                done_blocks=Count(
-                    'modules__blocks__moduleblockdone',
-                    filter=Q(modules__blocks__moduleblockdone__user=user),
-                    distinct=True
-                ),
-            ).annotate(
-                progress=Case(
-                    When(total_blocks=0, then=Value(0)),
-                    default=ExpressionWrapper(
-                        F('done_blocks') * 100 / F('total_blocks'),
-                        output_field=IntegerField()
-                    ),
-                    output_field=IntegerField()
-                ),
-                is_done=Case(
-                    When(total_blocks=0, then=Value(False)),
-                    When(total_blocks=F('done_blocks'), then=Value(True)),
-                    default=Value(False),
-                    output_field=BooleanField()
-                )
-            ).order_by('order_num')
-        else:
-            lessons_qs = Lesson.objects.annotate(
-                total_blocks=Count('modules__blocks', distinct=True),
-                done_blocks=Value(0, output_field=IntegerField()),
-                progress=Value(0, output_field=IntegerField()),
-                is_done=Value(False, output_field=BooleanField())
-            ).order_by('order_num')
-
-        # Предзагрузка уроков с прогрессом
-        levels = Level.objects.prefetch_related(
+        # ---------- Lessons queryset (прогресс - overlay_lessons) ----------
+        # только поля LessonShortSerializer - без описаний и файлов урока
+        lessons_qs = Lesson.objects.only(
+            'id', 'level_id', 'order_num', 'title', 'slug', 'short_description', 'is_free', 'is_common'
+        ).annotate(
+            total_blocks=Count('modules__blocks', distinct=True),
+            done_blocks=Value(0, output_field=IntegerField()),
+            progress=Value(0, output_field=IntegerField()),
+            is_done=Value(False, output_field=BooleanField())
+        ).order_by('order_num')
+
+        # Предзагрузка уроков
+        levels = Level.objects.select_related('course').prefetch_related(
             Prefetch('lessons', queryset=lessons_qs)
         )
 
         # ---------- Levels queryset ----------
-        if user.is_authenticated:
-            levels = levels.annotate(
-                total_lessons=Count('lessons', distinct=True),
-                done_lessons=Count('lessons', filter=Q(lessons__modules__blocks__moduleblockdone__user=user),
-                                   distinct=True),
-            ).annotate(
-                progress=Case(
-                    When(total_lessons=0, then=Value(0)),
-                    default=ExpressionWrapper(
-                        F('done_lessons') * 100 / F('total_lessons'),
-                        output_field=IntegerField()
-                    ),
-                    output_field=IntegerField()
-                ),
-                is_done=Case(
-                    When(total_lessons=0, then=Value(False)),
-                    When(total_lessons=F('done_lessons'), then=Value(True)),
-                    default=Value(False),
-                    output_field=BooleanField()
-                )
-            )
-        else:
-            levels = levels.annotate(
-                total_lessons=Count('lessons', distinct=True),
-                done_lessons=Value(0, output_field=IntegerField()),
-                progress=Value(0, output_field=IntegerField()),
-                is_done=Value(False, output_field=BooleanField())
-            )
+        levels = levels.annotate(
+            total_lessons=Count('lessons', distinct=True),
+            done_lessons=Value(0, output_field=IntegerField()),
+            progress=Value(0, output_field=IntegerField()),
+            is_done=Value(False, output_field=BooleanField())
+        )
 
         return levels
 
+    def build_snapshot(self, levels, many=False):
+        data = self.get_serializer(levels, many=many).data
+        lessons = [lesson for level in (levels if many else [levels]) for lesson in level.lessons.all()]
+        return {
+            'data': data,
+            'total_blocks': {lesson.id: lesson.total_blocks for lesson in lessons},
+        }
+
+    @conditional_content()
+    def list(self, request, *args, **kwargs):
+        snapshot = get_snapshot(
+            'levels', 'list', request,
+            lambda: self.build_snapshot(list(self.get_queryset()), many=True)
+        )
+        levels = snapshot['data']
+        lessons = [lesson for level in levels for lesson in level['lessons']]
+        overlay_lessons(lessons, snapshot['total_blocks'], request.user)
+        overlay_locks(lessons, request.user)
+        return Response(levels)
+
+    @conditional_content()
+    def retrieve(self, request, *args, **kwargs):
+        snapshot = get_snapshot(
+            'level', kwargs[self.lookup_field], request,
+            lambda: self.build_snapshot(self.get_object())
+        )
+        level = snapshot['data']
+        overlay_lessons(level['lessons'], snapshot['total_blocks'], request.user)
+        overlay_locks(level['lessons'], request.user)
+        return Response(level)
+
 
 class LessonViewSet(viewsets.ModelViewSet):
     queryset = Lesson.objects.all()
@@ -250,148 +230,152 @@ class LessonViewSet(viewsets.ModelViewSet):
     lookup_field = 'slug'
 
     @action(detail=True, methods=['get'])
+    @conditional_content()
     def get_table(self, request, slug=None):
         """Возвращает HTML таблицы урока"""
-        lesson = self.get_object()
+        lesson = get_object_or_404(Lesson.objects.only('id', 'slug', 'is_free'), slug=slug)
+        check_lesson_access(request.user, lesson.is_free)
+        table = LessonTable.objects.filter(lesson=lesson).values_list('content', flat=True).first()
         return Response({
             "slug": lesson.slug,
-            "table": lesson.table
+            "table": table
         })
 
     @action(detail=True, methods=['get'])
+    @conditional_content()
     def videos(self, request, slug=None):
-        """Все видео урока с фразами"""
-        lesson = self.get_object()
-        all_videos = []
-
-        # Проходим по модулям → блокам → видео
-        for module in lesson.modules.all():
-            for block in module.blocks.all():
-                for video in block.videos.all():
-                    all_videos.append(video)
+        """
+        Все видео урока с фразами.
+        ?fields=id,file,video_number - вернуть только перечисленные поля (без фраз, если их нет в списке)
+        """
+        lesson = get_object_or_404(Lesson.objects.only('id', 'is_free'), slug=slug)
+        check_lesson_access(request.user, lesson.is_free)
+
+        fields = VIDEO_FIELDS
+        if request.query_params.get('fields'):
+            requested = [f.strip() for f in request.query_params['fields'].split(',')]
+            fields = tuple(f for f in requested if f in VIDEO_FIELDS)
+            if not fields:
+                return Response(
+                    {"detail": f"Unknown fields. Allowed: {', '.join(VIDEO_FIELDS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        serializer = VideoSerializer(all_videos, many=True, context={"request": request})
-        return Response(serializer.data)
+        videos = lesson_videos_queryset(lesson, fields)
+        return Response([video_payload(video, request, fields) for video in videos])
 
     def get_queryset(self):
-
-        user = self.request.user
-
-        # ---------- DictionaryItem queryset ----------
-        dictionary_items_qs = DictionaryItem.objects.all()
-
-        if user.is_authenticated:
-            favorites = DictionaryItemFavorite.objects.filter(
-                user=user,
-                dictionary_item=OuterRef("pk")
-            )
-            dictionary_items_qs = dictionary_items_qs.annotate(
-                is_favorite=Exists(favorites)
-            )
-        else:
-            dictionary_items_qs = dictionary_items_qs.annotate(
-                is_favorite=Value(False, output_field=BooleanField())
-            )
+        # Пользовательские поля (progress, is_done, is_favorite) - overlay поверх снапшота
 
         # ---------- Modules queryset ----------
-        if user.is_authenticated:
-            modules_qs = Module.objects.annotate(
-                total_blocks=Count('blocks', distinct=True),
-                done_blocks=Count(
-                    'blocks__moduleblockdone',
-                    filter=Q(blocks__moduleblockdone__user=user),
-                    distinct=True
-                )
-            ).annotate(
-                is_done=Case(
-                    When(total_blocks=0, then=Value(False)),
-                    When(total_blocks=F('done_blocks'), then=Value(True)),
-                    default=Value(False),
-                    output_field=BooleanField()
-                )
-            ).order_by('sorting')
-        else:
-            modules_qs = Module.objects.annotate(
-                total_blocks=Count('blocks', distinct=True),
-                done_blocks=Value(0, output_field=IntegerField()),
-                is_done=Value(False, output_field=BooleanField())
-            ).order_by('sorting')
+        modules_qs = Module.objects.annotate(
+            total_blocks=Count('blocks', distinct=True),
+            done_blocks=Value(0, output_field=IntegerField()),
+            is_done=Value(False, output_field=BooleanField())
+        ).order_by('sorting')
 
         # ---------- Lessons queryset ----------
-        if user.is_authenticated:
-            lessons_qs = Lesson.objects.annotate(
-                total_blocks=Count('modules__blocks', distinct=True),
-                done_blocks=Count(
-                    'modules__blocks__moduleblockdone',
-                    filter=Q(modules__blocks__moduleblockdone__user=user),
-                    distinct=True
-                )
-            ).annotate(
-                progress=Case(
-                    When(total_blocks=0, then=Value(0)),
-                    default=F('done_blocks') * 100 / F('total_blocks'),
-                    output_field=IntegerField()
-                ),
-                is_done=Case(
-                    When(total_blocks=0, then=Value(False)),
-                    When(total_blocks=F('done_blocks'), then=Value(True)),
-                    default=Value(False),
-                    output_field=BooleanField()
-                )
-            ).prefetch_related(
-                Prefetch('modules', queryset=modules_qs),
-                Prefetch(
-                    'dictionary_groups__items',
-                    queryset=dictionary_items_qs
-                )
-            )
-        else:
-            lessons_qs = Lesson.objects.annotate(
-                total_blocks=Count('modules__blocks', distinct=True),
-                done_blocks=Value(0, output_field=IntegerField()),
-                progress=Value(0, output_field=IntegerField()),
-                is_done=Value(False, output_field=BooleanField())
-            ).prefetch_related(
-                Prefetch('modules', queryset=modules_qs),
-                Prefetch(
-                    'dictionary_groups__items',
-                    queryset=dictionary_items_qs
+        lessons_qs = Lesson.objects.select_related('level__course').annotate(
+            total_blocks=Count('modules__blocks', distinct=True),
+            done_blocks=Value(0, output_field=IntegerField()),
+            progress=Value(0, output_field=IntegerField()),
+            is_done=Value(False, output_field=BooleanField()),
+            has_table=Exists(LessonTable.objects.filter(lesson=OuterRef('pk'))),
+        ).prefetch_related(
+            Prefetch('modules', queryset=modules_qs),
+            Prefetch(
+                'dictionary_groups__items',
+                queryset=DictionaryItem.objects.annotate(
+                    is_favorite=Value(False, output_field=BooleanField())
                 )
             )
+        )
 
         return lessons_qs
 
+    def build_snapshot(self, lessons, many=False):
+        data = self.get_serializer(lessons, many=many).data
+        lessons = lessons if many else [lessons]
+        return {
+            'data': data,
+            'total_blocks': {lesson.id: lesson.total_blocks for lesson in lessons},
+            'is_free': {lesson.id: lesson.is_free for lesson in lessons},
+            'module_blocks': {
+                module.id: module.total_blocks
+                for lesson in lessons for module in lesson.modules.all()
+            },
+        }
+
+    def overlay(self, lessons, snapshot):
+        overlay_lessons(lessons, snapshot['total_blocks'], self.request.user)
+        overlay_lesson_details(lessons, snapshot['module_blocks'], self.request.user)
+
+    @conditional_content()
+    def list(self, request, *args, **kwargs):
+        snapshot = get_snapshot(
+            'lessons', 'list', request,
+            lambda: self.build_snapshot(list(self.get_queryset()), many=True)
+        )
+        self.overlay(snapshot['data'], snapshot)
+        overlay_locks(snapshot['data'], request.user, snapshot['is_free'])
+        hide_locked_content(snapshot['data'])
+        return Response(snapshot['data'])
+
+    @conditional_content()
+    def retrieve(self, request, *args, **kwargs):
+        snapshot = get_snapshot(
+            'lesson', kwargs[self.lookup_field], request,
+            lambda: self.build_snapshot(self.get_object())
+        )
+        check_lesson_access(request.user, snapshot['is_free'][snapshot['data']['id']])
+        self.overlay([snapshot['data']], snapshot)
+        return Response(snapshot['data'])
+
+# Действия ModuleViewSet, которые отдают модули через ModuleSerializer
+MODULE_SERIALIZER_ACTIONS = ('list', 'update', 'partial_update')
+
+
 class ModuleViewSet(viewsets.ModelViewSet):
     queryset = Module.objects.all()
     serializer_class = ModuleSerializer
     lookup_field = 'id'
 
-    def retrieve(self, request, *args, **kwargs):
-        module = self.get_object()
-
-        user = request.user
+    def build_snapshot(self, module_id):
+        module = get_object_or_404(module_payload_queryset(), id=module_id)
+        lesson = module.lesson
+        return {
+            'data': build_module_payload(module, self.request),
+            'lesson_is_free': lesson.is_free,
+            'last_url': f'/courses/{lesson.level.course.slug}/{lesson.level.slug}/{lesson.slug}?m_id={module.id}',
+        }
 
-        module_id = module.id
-        lesson_slug = module.lesson.slug
-        level_slug = module.lesson.level.slug
-        course_slug = module.lesson.level.course.slug
+    def retrieve(self, request, *args, **kwargs):
+        module_id = kwargs[self.lookup_field]
+        snapshot = get_snapshot(
+            'module', module_id, request,
+            lambda: self.build_snapshot(module_id)
+        )
 
-        last_url= f'/courses/{course_slug}/{level_slug}/{lesson_slug}?m_id={module_id}'
-        if user.is_authenticated:
-            user.last_lesson_url = last_url
-            user.save(update_fields=['last_lesson_url'])
+        check_lesson_access(request.user, snapshot['lesson_is_free'])
 
-        serializer = self.get_serializer(
-            module,
-            context={"request": request}
-        )
+        # last_lesson_url обновляем и при ответе 304 (запись в БД отложенная)
+        if request.user.is_authenticated:
+            remember_last_lesson_url(request.user.pk, snapshot['last_url'])
 
+        return self.module_response(request, snapshot)
 
-        return Response(serializer.data)
+    @conditional_content()
+    def module_response(self, request, snapshot):
+        state = load_module_user_state(snapshot['data']['id'], request.user)
+        return Response(apply_module_state(snapshot['data'], state))
 
     def get_queryset(self):
         user = self.request.user
 
+        if self.action not in MODULE_SERIALIZER_ACTIONS:
+            # retrieve собирается из module_payload, остальным нужен только сам модуль
+            return Module.objects.all()
+
         # ---------- DictionaryItem queryset ----------
         dictionary_items_qs = DictionaryItem.objects.all()
 
@@ -414,6 +398,18 @@ class ModuleViewSet(viewsets.ModelViewSet):
         else:
             lesson_item_favorites_qs = LessonItemFavoriteItem.objects.none()
 
+        # ---------- Blocks (is_done одним EXISTS на весь список) ----------
+        if user.is_authenticated:
+            blocks_qs = ModuleBlock.objects.annotate(
+                is_done=Exists(
+                    ModuleBlockDone.objects.filter(user=user, module_block=OuterRef("pk"))
+                )
+            )
+        else:
+            blocks_qs = ModuleBlock.objects.annotate(
+                is_done=Value(False, output_field=BooleanField())
+            )
+
         # ---------- Module queryset ----------
         if user.is_authenticated:
             modules_qs = (
@@ -442,6 +438,9 @@ class ModuleViewSet(viewsets.ModelViewSet):
                         "module_dictionary_groups__items",
                         queryset=dictionary_items_qs
                     ),
+                    Prefetch("blocks", queryset=blocks_qs),
+                    "blocks__videos__phrases",
+                    "blocks__videos__watermarks",
                     Prefetch(
                         "blocks__items__lesson_item_favorites",
                         queryset=lesson_item_favorites_qs,
@@ -462,6 +461,9 @@ class ModuleViewSet(viewsets.ModelViewSet):
                         "module_dictionary_groups__items",
                         queryset=dictionary_items_qs
                     ),
+                    Prefetch("blocks", queryset=blocks_qs),
+                    "blocks__videos__phrases",
+                    "blocks__videos__watermarks",
                     Prefetch(
                         "blocks__items__lesson_item_favorites",
                         queryset=lesson_item_favorites_qs,
@@ -473,7 +475,7 @@ class ModuleViewSet(viewsets.ModelViewSet):
         return modules_qs
 
 
-    @action(detail=False, methods=['post'], url_path='toggle_favorite')
+    @action(detail=False, methods=['post'], url_path='toggle_favorite', throttle_classes=[ToggleRateThrottle])
     def toggle_favorite(self, request, id=None):
         user = request.user
         lesson_item_id = request.data.get('id')
@@ -483,59 +485,34 @@ class ModuleViewSet(viewsets.ModelViewSet):
         )
         if not created:
             obj.delete()
+        bump_progress_version(user)
         return Response(status=status.HTTP_200_OK)
 
 
-    @action(detail=False, methods=['post'], url_path='toggle_block')
+    @action(detail=False, methods=['post'], url_path='toggle_block', throttle_classes=[ToggleRateThrottle])
     def toggle_block(self, request, pk=None):
         user = request.user
-        module_block_id = request.data.get('id')
-        obj,created = ModuleBlockDone.objects.get_or_create(
-           user=user,
-           module_block_id=module_block_id
-        )
-        if not created:
-           obj.delete()
-
-        try:
-            # Получаем урок и сразу считаем статистику
-            from django.db.models import Count
-
-            lesson_stats = ModuleBlock.objects.filter(
-                id=module_block_id
-            ).annotate(
-                total_blocks=Count('module__lesson__modules__blocks'),
-                done_blocks=Count(
-                    'module__lesson__modules__blocks__moduleblockdone',
-                    filter=Q(module__lesson__modules__blocks__moduleblockdone__user=user)
-                )
-            ).values('module__lesson', 'total_blocks', 'done_blocks').first()
-
-            if lesson_stats:
-                lesson_id = lesson_stats['module__lesson']
-                total_blocks = lesson_stats['total_blocks']
-                done_blocks = lesson_stats['done_blocks']
-
-                print(total_blocks)
-                print(done_blocks)
-
-                # Обновляем статус урока
-                if total_blocks > 0 and done_blocks == total_blocks:
-                    LessonDone.objects.get_or_create(
-                        user=user,
-                        lesson_id=lesson_id
-                    )
-                else:
-                    LessonDone.objects.filter(
-                        user=user,
-                        lesson_id=lesson_id
-                    ).delete()
+        serializer = ModuleBlockToggleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if toggle_block_done(user, serializer.validated_data['id']) is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        bump_progress_version(user)
+        return Response(status=status.HTTP_200_OK)
 
-        except Exception as e:
-            # Логируем ошибку, но не прерываем выполнение
-            print(f"Error updating lesson status: {e}")
+    @action(detail=False, methods=['post'], url_path='sync_blocks', throttle_classes=[ToggleRateThrottle])
+    def sync_blocks(self, request, pk=None):
+        """
+        Пакетная отметка блоков: {"blocks": [{"id": 1, "done": true}, ...]}.
+        Для одного id побеждает последнее состояние в списке.
+        """
+        serializer = ModuleBlockSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        states = {block['id']: block['done'] for block in serializer.validated_data['blocks']}
 
-        return Response(status=status.HTTP_200_OK)
+        done, undone, unknown = sync_blocks_done(request.user, states)
+        if done or undone:
+            bump_progress_version(request.user)
+        return Response({'done': done, 'undone': undone, 'unknown': unknown})
 
 
 
@@ -581,7 +558,7 @@ class DictionaryItemViewSet(viewsets.ModelViewSet):
 
         return queryset
 
-    @action(detail=True, methods=['post'], url_path='toggle_favorite')
+    @action(detail=True, methods=['post'], url_path='toggle_favorite', throttle_classes=[ToggleRateThrottle])
     def toggle_favorite(self, request, id=None):
         user = request.user
         obj = self.get_object()
@@ -591,4 +568,5 @@ class DictionaryItemViewSet(viewsets.ModelViewSet):
         )
         if not created:
             obj.delete()
+        bump_progress_version(user)
         return Response(status=status.HTTP_200_OK)
@@ -1,6 +1,9 @@
 from lesson.models import Lesson, Module, LessonItem, Phrase, DictionaryItem, OrthographyItem
 from train.models import Topic, AudioFile, Phrase as TrainerPhrase
 
+# Источники глобального поиска. fields - поля с текстом (первое - русский,
+# второе - английский), values - поля ответа; пути через "__" для навигации
+# денормализуются в SearchDocument (search.services.documents)
 SEARCH_CONFIG = [
     {
         "key": "lessons",
@@ -8,18 +11,33 @@ SEARCH_CONFIG = [
         "fields": ["title"],
         "values": ["id", "title", "slug"],
     },
-    # {
-    #     "key": "modules",
-    #     "model": Module,
-    #     "fields": ["title"],
-    #     "values": ["id", "title", "lesson_id"],
-    # },
-    # {
-    #     "key": "lesson_items",
-    #     "model": LessonItem,
-    #     "fields": ["text_ru", "text_en"],
-    #     "values": ["id", "text_ru", "text_en", "block_id"],
-    # },
+    {
+        "key": "modules",
+        "model": Module,
+        "fields": ["title"],
+        "values": ["id",
+                   "title",
+                   "lesson_id",
+                   "lesson__level__course__slug",
+                   "lesson__level__slug",
+                   "lesson__slug"
+                   ],
+    },
+    {
+        "key": "lesson_items",
+        "model": LessonItem,
+        "fields": ["text_ru", "text_en"],
+        "values": ["id",
+                   "text_ru",
+                   "text_en",
+                   "file",
+                   "block_id",
+                   "block__module_id",
+                   "block__module__lesson__level__course__slug",
+                   "block__module__lesson__level__slug",
+                   "block__module__lesson__slug"
+                   ],
+    },
     {
         "key": "phrases",
         "model": Phrase,
@@ -47,24 +65,44 @@ SEARCH_CONFIG = [
 
                    ],
     },
-    # {
-    #     "key": "orthography",
-    #     "model": OrthographyItem,
-    #     "fields": ["ru_text", "en_text"],
-    #     "values": ["id", "ru_text", "en_text", "lesson_id"],
-    # },
-    # {
-    #     "key": "trainer_topics",
-    #     "model": Topic,
-    #     "fields": ["name"],
-    #     "values": ["id", "name", "slug", "level_id"],
-    # },
-    # {
-    #     "key": "trainer_audio",
-    #     "model": AudioFile,
-    #     "fields": ["name"],
-    #     "values": ["id", "name", "topic_id"],
-    # },
+    {
+        "key": "orthography",
+        "model": OrthographyItem,
+        "fields": ["ru_text", "en_text"],
+        "values": ["id",
+                   "ru_text",
+                   "en_text",
+                   "lesson_id",
+                   "lesson__level__course__slug",
+                   "lesson__level__slug",
+                   "lesson__slug"
+                   ],
+    },
+    {
+        "key": "trainer_topics",
+        "model": Topic,
+        "fields": ["name"],
+        "values": ["id",
+                   "name",
+                   "slug",
+                   "level_id",
+                   "level__slug",
+                   "level__course__slug",
+                   ],
+    },
+    {
+        "key": "trainer_audio",
+        "model": AudioFile,
+        "fields": ["name"],
+        "values": ["id",
+                   "name",
+                   "file",
+                   "topic_id",
+                   "topic__slug",
+                   "topic__level__slug",
+                   "topic__level__course__slug",
+                   ],
+    },
     {
         "key": "trainer_phrases",
         "model": TrainerPhrase,
@@ -0,0 +1,90 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from search.utils import DOCUMENT_MODES, SEARCH_MODES, configure_search_connection, perform_search
+from train.models import Course, Level, Topic, Phrase
+
+WORDS_EN = [
+    "hello", "world", "morning", "evening", "coffee", "table", "window", "travel",
+    "airport", "ticket", "friend", "family", "weather", "summer", "winter", "street",
+    "market", "dinner", "breakfast", "station", "letter", "music", "garden", "holiday",
+]
+WORDS_RU = [
+    "привет", "мир", "утро", "вечер", "кофе", "стол", "окно", "путешествие",
+    "аэропорт", "билет", "друг", "семья", "погода", "лето", "зима", "улица",
+    "рынок", "ужин", "завтрак", "вокзал", "письмо", "музыка", "сад", "праздник",
+]
+DEFAULT_QUERIES = ["breakfst", "good morning", "аэропорт", "зимняя погода"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнение режимов поиска (icontains / similar / knn) на синтетической таблице "
+        "фраз тренажёра. Данные создаются в транзакции и откатываются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200000, help="Сколько фраз сгенерировать")
+        parser.add_argument("--repeat", type=int, default=5, help="Повторов каждого запроса")
+        parser.add_argument("--threshold", type=float, default=None, help="pg_trgm.similarity_threshold")
+        model_modes = [mode for mode in SEARCH_MODES if mode not in DOCUMENT_MODES]
+        parser.add_argument("--mode", choices=model_modes, nargs="*", help="Режимы (по умолчанию все)")
+        parser.add_argument("--query", nargs="*", help="Поисковые запросы")
+
+    def handle(self, *args, **options):
+        # fts работает только по SearchDocument - perform_search его не принимает
+        modes = options["mode"] or [mode for mode in SEARCH_MODES if mode not in DOCUMENT_MODES]
+        queries = options["query"] or DEFAULT_QUERIES
+
+        with transaction.atomic():
+            configure_search_connection(0, options["threshold"])
+            self._generate(options["rows"])
+
+            for query in queries:
+                self.stdout.write(f"\n«{query}»")
+                for mode in modes:
+                    timings = []
+                    for _ in range(options["repeat"]):
+                        started = time.perf_counter()
+                        rows = perform_search(
+                            model=Phrase,
+                            fields=["text_ru", "text_en"],
+                            values=["id", "text_ru", "text_en"],
+                            query=query,
+                            request=None,
+                            mode=mode,
+                        )
+                        timings.append((time.perf_counter() - started) * 1000)
+                    self.stdout.write(
+                        f"  {mode:<10} медиана {statistics.median(timings):8.1f} мс, "
+                        f"мин {min(timings):8.1f} мс, найдено {len(rows)}"
+                    )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("\n✅ Синтетические данные откатаны"))
+
+    def _generate(self, rows):
+        course = Course.objects.create(name="benchmark", slug="benchmark-search")
+        level = Level.objects.create(course=course, name="benchmark", slug="benchmark")
+        topic = Topic.objects.create(level=level, name="benchmark", slug="benchmark")
+
+        started = time.perf_counter()
+        table = connection.ops.quote_name(Phrase._meta.db_table)
+        # Подзапрос ссылается на g, чтобы random() вычислялся для каждой строки заново
+        phrase_sql = (
+            "(SELECT string_agg((%s::text[])[1 + floor(random() * {n})::int], ' ') "
+            "FROM generate_series(1, 2 + g %% 5))"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (topic_id, text_ru, text_en, \"order\") "
+                f"SELECT %s, {phrase_sql.format(n=len(WORDS_RU))}, {phrase_sql.format(n=len(WORDS_EN))}, g "
+                f"FROM generate_series(1, %s) AS g",
+                [topic.id, WORDS_RU, WORDS_EN, rows],
+            )
+            cursor.execute(f"ANALYZE {table}")
+        self.stdout.write(f"Сгенерировано фраз: {rows} за {time.perf_counter() - started:.1f} с")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from search.services.documents import get_sources, rebuild_documents
+
+
+class Command(BaseCommand):
+    help = "Полная перестройка таблицы глобального поиска (SearchDocument) по SEARCH_CONFIG"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", nargs="*", choices=list(get_sources()), help="Источники (по умолчанию все)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = rebuild_documents(kinds=options["kind"] or None, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            "✅ Поисковый индекс перестроен: "
+            + ", ".join(f"{kind} {count}" for kind, count in created.items())
+        ))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:31
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        # gin_trgm_ops ниже - расширение pg_trgm должно быть до создания индекса
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=32, verbose_name='Источник (ключ SEARCH_CONFIG)')),
+                ('object_id', models.BigIntegerField(verbose_name='ID объекта')),
+                ('text_ru', models.TextField(blank=True, default='')),
+                ('text_en', models.TextField(blank=True, default='')),
+                ('payload', models.JSONField(default=dict)),
+                ('file_url', models.CharField(blank=True, default='', max_length=500)),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['text_ru', 'text_en'], name='search_doc_text_trgm', opclasses=['gin_trgm_ops', 'gin_trgm_ops'])],
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+from django.db import migrations
+
+# Источники на момент этой миграции (копия search.config.SEARCH_CONFIG):
+# (kind, модель, поля с текстом - русский, английский, поля payload, файловое поле).
+# Миграция не импортирует живой код - его изменения не должны менять её результат
+SOURCES = [
+    ("lessons", "lesson.Lesson", ["title"], ["id", "title", "slug"], None),
+    ("modules", "lesson.Module", ["title"], [
+        "id", "title", "lesson_id",
+        "lesson__level__course__slug", "lesson__level__slug", "lesson__slug",
+    ], None),
+    ("lesson_items", "lesson.LessonItem", ["text_ru", "text_en"], [
+        "id", "text_ru", "text_en", "block_id", "block__module_id",
+        "block__module__lesson__level__course__slug", "block__module__lesson__level__slug",
+        "block__module__lesson__slug",
+    ], "file"),
+    ("phrases", "lesson.Phrase", ["text_ru", "text_en"], [
+        "id", "text_ru", "text_en",
+        "video__block__module__lesson__level__course__slug", "video__block__module__lesson__level__slug",
+        "video__block__module__lesson__slug",
+    ], "file"),
+    ("dictionary", "lesson.DictionaryItem", ["text_ru", "text_en"], [
+        "id", "text_ru", "text_en",
+        "group__lesson__level__course__slug", "group__lesson__level__slug", "group__lesson__slug",
+    ], "file"),
+    ("orthography", "lesson.OrthographyItem", ["ru_text", "en_text"], [
+        "id", "ru_text", "en_text", "lesson_id",
+        "lesson__level__course__slug", "lesson__level__slug", "lesson__slug",
+    ], None),
+    ("trainer_topics", "train.Topic", ["name"], [
+        "id", "name", "slug", "level_id", "level__slug", "level__course__slug",
+    ], None),
+    ("trainer_audio", "train.AudioFile", ["name"], [
+        "id", "name", "topic_id", "topic__slug", "topic__level__slug", "topic__level__course__slug",
+    ], "file"),
+    ("trainer_phrases", "train.Phrase", ["text_ru", "text_en"], [
+        "id", "text_ru", "text_en", "topic__slug", "topic__level__slug", "topic__level__course__slug",
+    ], "file"),
+]
+
+BATCH_SIZE = 1000
+
+
+def normalize_text(text):
+    return " ".join((text or "").lower().replace("ё", "е").split())
+
+
+def fill_documents(apps, schema_editor):
+    # Индекс нужен сразу после включения SEARCH_DOCUMENTS: сигналы обновляют
+    # только изменившиеся объекты, существующие строки без заполнения не найдутся
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    for kind, label, text_fields, values, file_field in SOURCES:
+        model = apps.get_model(label)
+        storage = model._meta.get_field(file_field).storage if file_field else None
+        columns = [*values, file_field] if file_field else values
+        batch = []
+        for row in model.objects.order_by().values(*columns).iterator(chunk_size=2000):
+            file_name = row.pop(file_field, None) if file_field else None
+            batch.append(SearchDocument(
+                kind=kind,
+                object_id=row["id"],
+                text_ru=normalize_text(row.get(text_fields[0])),
+                text_en=normalize_text(row.get(text_fields[1])) if len(text_fields) > 1 else "",
+                payload=row,
+                file_url=storage.url(file_name) if file_name else "",
+            ))
+            if len(batch) >= BATCH_SIZE:
+                SearchDocument.objects.bulk_create(batch)
+                batch = []
+        SearchDocument.objects.bulk_create(batch)
+
+
+def clear_documents(apps, schema_editor):
+    apps.get_model('search', 'SearchDocument').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_search_vector'),
+        ('lesson', '0042_module_block_done_unique'),
+        ('train', '0023_trigram_gist'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_documents, clear_documents),
+    ]
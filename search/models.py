@@ -1,3 +1,43 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 
-# Create your models here.
+
+class SearchDocument(models.Model):
+    """
+    Денормализованная запись глобального поиска: по строке на объект каждого
+    источника SEARCH_CONFIG. Поддерживается сигналами (search.signals),
+    полностью перестраивается командой rebuild_search_index.
+    """
+    kind = models.CharField(max_length=32, verbose_name="Источник (ключ SEARCH_CONFIG)")
+    object_id = models.BigIntegerField(verbose_name="ID объекта")
+    # Нормализованный текст (нижний регистр, ё → е, одиночные пробелы)
+    text_ru = models.TextField(blank=True, default="")
+    text_en = models.TextField(blank=True, default="")
+    # Готовая строка ответа: поля values из конфигурации, включая slug-и для навигации
+    payload = models.JSONField(default=dict)
+    file_url = models.CharField(max_length=500, blank=True, default="")
+    # Лексемы со стеммингом: русский текст - вес A, английский - B.
+    # Столбец вычисляет сама БД, запрос не вызывает to_tsvector
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("text_ru", config="russian", weight="A")
+            + SearchVector("text_en", config="english", weight="B")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
+
+    class Meta:
+        unique_together = ("kind", "object_id")
+        indexes = [
+            GinIndex(
+                name="search_doc_text_trgm",
+                fields=["text_ru", "text_en"],
+                opclasses=["gin_trgm_ops", "gin_trgm_ops"],
+            ),
+            GinIndex(name="search_doc_vector", fields=["search_vector"]),
+        ]
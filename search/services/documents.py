@@ -0,0 +1,255 @@
+"""
+Таблица SearchDocument - единый индекс глобального поиска.
+
+Каждый источник SEARCH_CONFIG проецируется одним values() по своим путям
+(со slug-ами курса/уровня/урока) в строки SearchDocument. Поиск по всем
+источникам - один запрос по GIN-индексу с ROW_NUMBER() по kind.
+
+Синхронизация: сигналы только отмечают изменившиеся объекты, а пересчёт идёт
+пачкой после коммита транзакции. Внутри batch_updates() (import_course,
+import_trainer) отметки копятся до выхода из блока - один сброс на весь импорт.
+Изменение родителя (slug или перенос в другой уровень/урок) пересчитывает
+документы потомков. bulk_create/update() сигналов не шлют - после таких
+загрузок нужен rebuild_search_index.
+"""
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import Greatest, RowNumber
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity, TrigramWordSimilarity
+
+from search.config import SEARCH_CONFIG
+from search.models import SearchDocument
+from search.utils import configure_search_connection, file_fields, is_statement_timeout, resolve_field
+
+_state = threading.local()
+
+
+def normalize_text(text):
+    return " ".join((text or "").lower().replace("ё", "е").split())
+
+
+def get_sources():
+    return {cfg["key"]: cfg for cfg in SEARCH_CONFIG}
+
+
+@lru_cache(maxsize=None)
+def _file_path(kind):
+    """Путь к файловому полю источника (не больше одного на источник) или None"""
+    cfg = get_sources()[kind]
+    return next(iter(file_fields(cfg["model"], cfg["values"])), None)
+
+
+@lru_cache(maxsize=None)
+def get_dependencies():
+    """
+    {родительская модель: [(kind, путь от источника до родителя, {attname, ...})]}
+    - какие поля родителя попадают в документы источника
+    """
+    dependencies = {}
+    for kind, cfg in get_sources().items():
+        tracked = {}
+        for path in cfg["values"]:
+            parts = path.split("__")
+            for depth in range(1, len(parts)):
+                prefix = "__".join(parts[:depth])
+                model = resolve_field(cfg["model"], prefix).related_model
+                field = model._meta.get_field(parts[depth])
+                tracked.setdefault((model, prefix), set()).add(field.attname)
+        for (model, prefix), attnames in tracked.items():
+            dependencies.setdefault(model, []).append((kind, prefix, frozenset(attnames)))
+    return dependencies
+
+
+def _build(kind, rows):
+    cfg = get_sources()[kind]
+    pk = cfg["model"]._meta.pk.attname
+    text_fields = cfg["fields"]
+    file_path = _file_path(kind)
+    storage = file_fields(cfg["model"], cfg["values"]).get(file_path)
+    for row in rows:
+        file_name = row.pop(file_path, None) if file_path else None
+        yield SearchDocument(
+            kind=kind,
+            object_id=row[pk],
+            text_ru=normalize_text(row.get(text_fields[0])),
+            text_en=normalize_text(row.get(text_fields[1])) if len(text_fields) > 1 else "",
+            payload={key: value for key, value in row.items() if key in cfg["values"]},
+            file_url=storage.url(file_name) if file_name else "",
+        )
+
+
+def _rows(kind, condition=None):
+    cfg = get_sources()[kind]
+    pk = cfg["model"]._meta.pk.attname
+    qs = cfg["model"].objects.all()
+    if condition is not None:
+        qs = qs.filter(condition)
+    return qs.order_by().values(pk, *cfg["values"]).iterator(chunk_size=2000)
+
+
+def _upsert(documents, batch_size=1000):
+    documents = list(documents)
+    if not documents:
+        return 0
+    SearchDocument.objects.bulk_create(
+        documents,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["kind", "object_id"],
+        update_fields=["text_ru", "text_en", "payload", "file_url"],
+    )
+    return len(documents)
+
+
+def refresh_documents(kind, ids=(), condition=None):
+    """
+    Пересчитывает документы объектов ids (и подходящих под condition);
+    документы удалённых объектов из ids удаляются
+    """
+    ids = set(ids)
+    if ids:
+        condition = Q(pk__in=ids) if condition is None else condition | Q(pk__in=ids)
+    if condition is None:
+        return
+    documents = list(_build(kind, _rows(kind, condition)))
+    _upsert(documents)
+    missing = ids - {document.object_id for document in documents}
+    if missing:
+        SearchDocument.objects.filter(kind=kind, object_id__in=missing).delete()
+
+
+def rebuild_documents(kinds=None, batch_size=1000):
+    """Полная перестройка. Возвращает {kind: количество документов}"""
+    kinds = kinds or list(get_sources())
+    created = {}
+    with transaction.atomic():
+        if set(kinds) == set(get_sources()):
+            SearchDocument.objects.exclude(kind__in=kinds).delete()
+        for kind in kinds:
+            SearchDocument.objects.filter(kind=kind).delete()
+            created[kind] = 0
+            batch = []
+            for document in _build(kind, _rows(kind)):
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    created[kind] += _upsert(batch, batch_size)
+                    batch = []
+            created[kind] += _upsert(batch, batch_size)
+    return created
+
+
+def _pending():
+    if not hasattr(_state, "pending"):
+        _state.pending = {}
+    return _state.pending
+
+
+def mark_changed(kind, object_id=None, condition=None):
+    """Отмечает документы к пересчёту; пересчёт - после коммита текущей транзакции"""
+    ids, conditions = _pending().setdefault(kind, (set(), []))
+    if object_id is not None:
+        ids.add(object_id)
+    if condition is not None:
+        conditions.append(condition)
+    if getattr(_state, "batch_depth", 0):
+        return
+    # Регистрируем на каждую отметку: после отката транзакции её колбэки
+    # теряются, а повторный сброс уже пустого буфера ничего не делает
+    transaction.on_commit(flush_pending)
+
+
+@contextmanager
+def batch_updates():
+    """
+    Массовая загрузка через ORM: отметки копятся до выхода из блока и
+    сбрасываются один раз (после коммита, если блок внутри транзакции)
+    """
+    _state.batch_depth = getattr(_state, "batch_depth", 0) + 1
+    try:
+        yield
+    finally:
+        _state.batch_depth -= 1
+        if not _state.batch_depth and _pending():
+            transaction.on_commit(flush_pending)
+
+
+def flush_pending():
+    pending = _pending()
+    batch = dict(pending)
+    pending.clear()
+    for kind, (ids, conditions) in batch.items():
+        condition = None
+        for item in conditions:
+            condition = item if condition is None else condition | item
+        refresh_documents(kind, ids, condition)
+
+
+def _text_filter(query, lookup):
+    return Q(**{f"text_ru__{lookup}": query}) | Q(**{f"text_en__{lookup}": query})
+
+
+def search_documents(query, request, limit=20, mode=None, timeout_ms=0):
+    """
+    Все источники одним запросом: фильтр по GIN-индексам, ROW_NUMBER() по kind
+    оставляет первые limit документов каждого источника.
+    Возвращает (results, timed_out) в формате search_all.
+
+    fts - полнотекстовый поиск по search_vector (стемминг russian/english,
+    ранжирование ts_rank_cd); документы, найденные только по триграммам
+    (опечатки), идут после совпадений по словам.
+    """
+    sources = get_sources()
+    results = {kind: [] for kind in sources}
+    query = normalize_text(query)
+    mode = mode or settings.SEARCH_MODE
+
+    qs = SearchDocument.objects.filter(kind__in=sources)
+    if mode == "fts":
+        ts_query = (
+            SearchQuery(query, config="russian", search_type="websearch")
+            | SearchQuery(query, config="english", search_type="websearch")
+        )
+        # Опечатки: близость запроса к отдельным словам текста (%>), а не ко всей строке
+        qs = qs.filter(Q(search_vector=ts_query) | _text_filter(query, "trigram_word_similar")).annotate(
+            rank=SearchRank(F("search_vector"), ts_query, cover_density=True),
+            similarity=Greatest(
+                TrigramWordSimilarity(query, "text_ru"), TrigramWordSimilarity(query, "text_en"),
+            ),
+        )
+        order_by = [F("rank").desc(), F("similarity").desc(), F("object_id")]
+    else:
+        lookup = "icontains" if mode == "icontains" else "trigram_similar"
+        qs = qs.filter(_text_filter(query, lookup)).annotate(
+            similarity=Greatest(TrigramSimilarity("text_ru", query), TrigramSimilarity("text_en", query)),
+        )
+        order_by = [F("similarity").desc(), F("object_id")]
+
+    qs = (
+        qs.annotate(position=Window(RowNumber(), partition_by=F("kind"), order_by=order_by))
+        .filter(position__lte=limit)
+        .order_by("kind", "position")
+        .values("kind", "payload", "file_url")
+    )
+    try:
+        # SET LOCAL действует до конца транзакции (запроса при ATOMIC_REQUESTS)
+        with transaction.atomic():
+            configure_search_connection(timeout_ms, local=True)
+            rows = list(qs)
+    except OperationalError as exc:
+        # Потеря соединения и прочие ошибки - не таймаут, пусть падают
+        if not is_statement_timeout(exc):
+            raise
+        return results, list(sources)
+
+    for row in rows:
+        item = row["payload"]
+        file_path = _file_path(row["kind"])
+        if file_path:
+            item[file_path] = request.build_absolute_uri(row["file_url"]) if row["file_url"] else None
+        results[row["kind"]].append(item)
+    return results, []
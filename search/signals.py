@@ -0,0 +1,43 @@
+from django.db.models import Q
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from search.services.documents import get_dependencies, get_sources, mark_changed
+
+# Модель-источник → ключ SEARCH_CONFIG
+SOURCE_KINDS = {cfg["model"]: kind for kind, cfg in get_sources().items()}
+
+
+def source_changed(sender, instance, **kwargs):
+    mark_changed(SOURCE_KINDS[sender], object_id=instance.pk)
+
+
+def parent_pre_save(sender, instance, update_fields=None, **kwargs):
+    # Запоминаем поля родителя, которые денормализованы в документы потомков
+    instance._search_tracked = None
+    if instance.pk is None:
+        return
+    attnames = set().union(*(attnames for _, _, attnames in get_dependencies()[sender]))
+    if update_fields is not None:
+        attnames &= {sender._meta.get_field(name).attname for name in update_fields}
+        if not attnames:
+            return
+    instance._search_tracked = sender._base_manager.filter(pk=instance.pk).values(*attnames).first()
+
+
+def parent_post_save(sender, instance, created, **kwargs):
+    old = getattr(instance, "_search_tracked", None)
+    if created or not old:
+        return
+    changed = {attname for attname, value in old.items() if getattr(instance, attname) != value}
+    for kind, prefix, attnames in get_dependencies()[sender]:
+        if changed & attnames:
+            mark_changed(kind, condition=Q(**{prefix: instance.pk}))
+
+
+for model, kind in SOURCE_KINDS.items():
+    post_save.connect(source_changed, sender=model, dispatch_uid=f"search_source_save_{kind}")
+    post_delete.connect(source_changed, sender=model, dispatch_uid=f"search_source_delete_{kind}")
+
+for model in get_dependencies():
+    pre_save.connect(parent_pre_save, sender=model, dispatch_uid=f"search_parent_pre_save_{model._meta.label}")
+    post_save.connect(parent_post_save, sender=model, dispatch_uid=f"search_parent_post_save_{model._meta.label}")
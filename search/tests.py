@@ -1,3 +1,163 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.db import OperationalError, connection
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from lesson.models import Course, Level, Lesson, Module, ModuleBlock, Video, Phrase
+from search.models import SearchDocument
+from search.services.documents import get_sources, search_documents
+from search.utils import perform_search
+from ucanspeack_api.checks import check_search_mode
+
+
+def sleep_query(*args, **kwargs):
+    # Вместо настройки соединения - запрос, который statement_timeout отменит
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL statement_timeout = 1")
+        cursor.execute("SELECT pg_sleep(1)")
+
+
+class SearchErrorsTest(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get("/")
+
+    def test_statement_timeout_marks_all_sources(self):
+        with mock.patch("search.services.documents.configure_search_connection", sleep_query):
+            results, timed_out = search_documents("hello", self.request)
+        self.assertEqual(sorted(timed_out), sorted(get_sources()))
+        self.assertTrue(all(items == [] for items in results.values()))
+
+    def test_other_database_errors_propagate(self):
+        error = OperationalError("server closed the connection unexpectedly")
+        with mock.patch("search.services.documents.configure_search_connection", side_effect=error):
+            with self.assertRaises(OperationalError):
+                search_documents("hello", self.request)
+
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get("/")
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(title="Course", slug="course")
+            self.level = Level.objects.create(course=course, title="Level", slug="level")
+            self.lesson = Lesson.objects.create(level=self.level, title="Новая книга", slug="book")
+            self.module = Module.objects.create(lesson=self.lesson, title="Greetings", index="1")
+            block = ModuleBlock.objects.create(module=self.module, sorting=0, caption="caption")
+            video = Video.objects.create(block=block, video_number="1")
+            self.phrase = Phrase.objects.create(video=video, text_ru="Привет, мир", text_en="Hello world")
+
+    def document(self, kind, object_id):
+        return SearchDocument.objects.filter(kind=kind, object_id=object_id).first()
+
+
+class SearchDocumentSyncTest(SearchTestCase):
+    def test_documents_created_after_commit(self):
+        document = self.document("phrases", self.phrase.id)
+        self.assertEqual((document.text_ru, document.text_en), ("привет, мир", "hello world"))
+        self.assertEqual(document.payload["video__block__module__lesson__slug"], "book")
+
+    def test_parent_slug_change_updates_children(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.level.slug = "renamed"
+            self.level.save()
+        self.assertEqual(self.document("modules", self.module.id).payload["lesson__level__slug"], "renamed")
+        self.assertEqual(
+            self.document("phrases", self.phrase.id).payload["video__block__module__lesson__level__slug"], "renamed",
+        )
+
+    def test_deleted_objects_leave_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson.delete()
+        self.assertFalse(SearchDocument.objects.filter(kind__in=["lessons", "modules", "phrases"]).exists())
+
+
+class SearchDocumentModesTest(SearchTestCase):
+    def search(self, query, mode):
+        results, timed_out = search_documents(query, self.request, mode=mode)
+        self.assertEqual(timed_out, [])
+        return results
+
+    def test_icontains(self):
+        self.assertEqual([item["id"] for item in self.search("книга", "icontains")["lessons"]], [self.lesson.id])
+        self.assertEqual(self.search("книги", "icontains")["lessons"], [])
+
+    def test_similar_finds_typo(self):
+        phrases = self.search("hello wrld", "similar")["phrases"]
+        self.assertEqual([item["id"] for item in phrases], [self.phrase.id])
+
+    def test_fts_uses_stemming(self):
+        # "книги" и "книга" - одна основа в словаре russian
+        lessons = self.search("книги", "fts")["lessons"]
+        self.assertEqual([item["id"] for item in lessons], [self.lesson.id])
+        self.assertEqual(lessons[0]["slug"], "book")
+
+    def test_fts_finds_word_with_missing_letter(self):
+        phrases = self.search("привт", "fts")["phrases"]
+        self.assertEqual([item["id"] for item in phrases], [self.phrase.id])
+
+    def test_api_fts_mode(self):
+        response = APIClient().get("/api/search/", {"q": "книги", "mode": "fts"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["id"] for item in response.json()["lessons"]], [self.lesson.id])
+
+    def test_api_returns_results_by_source(self):
+        response = APIClient().get("/api/search/", {"q": "книга", "mode": "icontains"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["id"] for item in response.json()["lessons"]], [self.lesson.id])
+        self.assertEqual(response.json()["lessons"][0]["slug"], "book")
+        self.assertNotIn("timed_out", response.json())
+
+
+class ModelSearchTest(SearchTestCase):
+    """Поиск по таблицам источников (SEARCH_DOCUMENTS = False)"""
+
+    def search(self, query, mode):
+        return perform_search(
+            model=Phrase,
+            fields=["text_ru", "text_en"],
+            values=["id", "text_en", "file"],
+            query=query,
+            request=self.request,
+            mode=mode,
+        )
+
+    def test_modes(self):
+        for mode in ("icontains", "similar", "knn"):
+            with self.subTest(mode=mode):
+                self.assertEqual(
+                    self.search("hello world", mode),
+                    [{"id": self.phrase.id, "text_en": "Hello world", "file": None}],
+                )
+
+    def test_similar_finds_typo(self):
+        self.assertEqual([item["id"] for item in self.search("hello wrld", "similar")], [self.phrase.id])
+        self.assertEqual(self.search("hello wrld", "icontains"), [])
+
+    def test_fts_requires_documents(self):
+        with self.assertRaises(ValueError):
+            self.search("hello", "fts")
+
+    @override_settings(SEARCH_DOCUMENTS=False)
+    def test_api_rejects_fts_without_documents(self):
+        response = APIClient().get("/api/search/", {"q": "книги", "mode": "fts"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_rejects_unknown_mode(self):
+        self.assertEqual(APIClient().get("/api/search/", {"q": "hello", "mode": "regex"}).status_code, 400)
+
+
+class SearchModeCheckTest(TestCase):
+    def check_ids(self):
+        return [error.id for error in check_search_mode(None)]
+
+    def test_default_mode_passes(self):
+        self.assertEqual(self.check_ids(), [])
+
+    @override_settings(SEARCH_MODE="fts", SEARCH_DOCUMENTS=False)
+    def test_fts_requires_documents(self):
+        self.assertEqual(self.check_ids(), ["ucanspeack_api.E002"])
+
+    @override_settings(SEARCH_MODE="regex")
+    def test_unknown_mode(self):
+        self.assertEqual(self.check_ids(), ["ucanspeack_api.E003"])
@@ -1,17 +1,70 @@
-from django.db.models import Q
-from django.contrib.postgres.search import TrigramSimilarity
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 
-def get_attr(obj, path):
-    for p in path.split("__"):
-        obj = getattr(obj, p)
-        if obj is None:
-            return None
-    return obj
+from django.conf import settings
+from django.db import connection
+from django.db.models import FileField, Q
+from django.contrib.postgres.search import TrigramDistance, TrigramSimilarity
 
-def perform_search(model, fields, values, query, request, limit=20):
+logger = logging.getLogger(__name__)
+
+# Общий пул для параллельного поиска по моделям SEARCH_CONFIG
+_pool = ThreadPoolExecutor(max_workers=settings.SEARCH_WORKERS, thread_name_prefix="search")
+
+SEARCH_MODES = ("icontains", "similar", "knn", "fts")
+# Режимы, которым нужна таблица SearchDocument (SEARCH_DOCUMENTS = True)
+DOCUMENT_MODES = ("fts",)
+# SQLSTATE запроса, отменённого по statement_timeout
+QUERY_CANCELED = "57014"
+
+
+def resolve_field(model, path):
+    """Поле модели, на которое указывает путь вида fk__fk__field"""
+    *relations, name = path.split("__")
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def file_fields(model, values):
+    """Пути из values, ведущие к FileField / ImageField, и их хранилища"""
+    result = {}
+    for path in values:
+        field = resolve_field(model, path)
+        if isinstance(field, FileField):
+            result[path] = field.storage
+    return result
+
+
+def configure_search_connection(timeout_ms=0, threshold=None, local=False):
+    """
+    statement_timeout и пороги операторов % и %> для текущего соединения - одним
+    запросом. 0 снимает ограничение по времени; local=True - только до конца транзакции.
+    """
+    if threshold is None:
+        threshold = settings.SEARCH_SIMILARITY_THRESHOLD
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('statement_timeout', %s, %s), "
+            "set_config('pg_trgm.similarity_threshold', %s, %s), "
+            "set_config('pg_trgm.word_similarity_threshold', %s, %s)",
+            [
+                str(timeout_ms), local,
+                str(threshold), local,
+                str(settings.SEARCH_WORD_SIMILARITY_THRESHOLD), local,
+            ],
+        )
+
+
+def is_statement_timeout(exc):
+    """Запрос отменён по statement_timeout (SQLSTATE 57014 query_canceled)"""
+    return getattr(getattr(exc, "__cause__", None), "pgcode", None) == QUERY_CANCELED
+
+
+def _rank_search(model, fields, values, query, lookup, limit):
     q_filter = Q()
     for f in fields:
-        q_filter |= Q(**{f"{f}__icontains": query})
+        q_filter |= Q(**{f"{f}__{lookup}": query})
 
     qs = model.objects.filter(q_filter)
 
@@ -20,22 +73,109 @@ def perform_search(model, fields, values, query, request, limit=20):
         s = TrigramSimilarity(f, query)
         similarity = s if similarity is None else similarity + s
 
-    qs = qs.annotate(rank=similarity).order_by("-rank")
+    # values() по путям конфигурации собирает все JOIN-ы в один запрос
+    # вместо ленивой загрузки связанных объектов для каждой строки
+    qs = qs.annotate(rank=similarity).order_by("-rank").values(*values)
+    return list(qs[:limit])
 
-    result = []
 
-    for obj in qs[:limit]:
-        row = {}
+def _knn_search(model, fields, values, query, limit):
+    """
+    Для каждого поля - ORDER BY field <-> query LIMIT n (обход GiST-индекса
+    по расстоянию), подзапросы объединяются UNION ALL в один запрос.
+    Строка, найденная по нескольким полям, берётся с наименьшим расстоянием.
+    """
+    pk = model._meta.pk.attname
+    parts = [
+        model.objects
+        .filter(**{f"{f}__trigram_similar": query})
+        .annotate(distance=TrigramDistance(f, query))
+        .order_by("distance")
+        .values(pk, *values, "distance")[:limit]
+        for f in fields
+    ]
+    qs = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
 
-        for f in values:
-            val = get_attr(obj, f)
+    result = {}
+    for row in sorted(qs, key=lambda row: row["distance"]):
+        result.setdefault(row[pk], row)
+    rows = list(result.values())[:limit]
+    for row in rows:
+        del row["distance"]
+        if pk not in values:
+            del row[pk]
+    return rows
 
-            # Если это FileField / ImageField → делаем АБСОЛЮТНЫЙ URL
-            if hasattr(val, "url") and val:
-                row[f] = request.build_absolute_uri(val.url)
-            else:
-                row[f] = val
 
-        result.append(row)
+def perform_search(model, fields, values, query, request, limit=20, mode=None):
+    """
+    mode: icontains - подстрока с сортировкой по сумме similarity;
+    similar - фильтр оператором % (порог pg_trgm.similarity_threshold);
+    knn - similar с сортировкой по расстоянию <-> из GiST-индекса;
+    fts - только для SearchDocument (у таблиц источников нет tsvector).
+    """
+    mode = mode or settings.SEARCH_MODE
+    if mode in DOCUMENT_MODES:
+        raise ValueError(f"Режим {mode} работает только по SearchDocument (SEARCH_DOCUMENTS)")
+    if mode == "knn":
+        result = _knn_search(model, fields, values, query, limit)
+    else:
+        lookup = "icontains" if mode == "icontains" else "trigram_similar"
+        result = _rank_search(model, fields, values, query, lookup, limit)
+
+    # Файлы приходят именами из БД → делаем АБСОЛЮТНЫЙ URL без экземпляров моделей
+    files = file_fields(model, values)
+    for row in result:
+        for f, storage in files.items():
+            row[f] = request.build_absolute_uri(storage.url(row[f])) if row[f] else None
 
     return result
+
+
+def _search_in_thread(cfg, query, request, timeout_ms, mode):
+    # Поток пула держит своё соединение между задачами (не больше SEARCH_WORKERS
+    # соединений на процесс): statement_timeout и пороги выставляются заново на
+    # каждую задачу, а после ошибки соединение закрывается и откроется заново
+    try:
+        configure_search_connection(timeout_ms)
+        return perform_search(
+            model=cfg["model"],
+            fields=cfg["fields"],
+            values=cfg["values"],
+            query=query,
+            request=request,
+            mode=mode,
+        )
+    except Exception:
+        connection.close()
+        raise
+
+
+def search_all(configs, query, request, mode=None):
+    """
+    Поиск по всем конфигурациям параллельно. Возвращает (results, timed_out):
+    модели, не уложившиеся в SEARCH_TIMEOUT (или statement_timeout), получают
+    пустой список и перечисляются в timed_out; упавшие - пустой список и запись в лог.
+    """
+    timeout = settings.SEARCH_TIMEOUT
+    futures = {
+        _pool.submit(_search_in_thread, cfg, query, request, int(timeout * 1000), mode): cfg["key"]
+        for cfg in configs
+    }
+    done, _ = wait(futures, timeout=timeout)
+
+    results = {}
+    timed_out = []
+    for future, key in futures.items():
+        results[key] = []
+        if future not in done:
+            timed_out.append(key)
+            future.cancel()
+        elif is_statement_timeout(future.exception()):
+            # Запрос отменён базой по statement_timeout до дедлайна ответа
+            timed_out.append(key)
+        elif future.exception() is not None:
+            logger.warning("Поиск по %s прерван: %s", key, future.exception())
+        else:
+            results[key] = future.result()
+    return results, timed_out
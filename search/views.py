@@ -1,26 +1,39 @@
+from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
+from ucanspeack_api.throttling import SearchRateThrottle
+
 from .config import SEARCH_CONFIG
-from .utils import perform_search
+from .services.documents import search_documents
+from .utils import DOCUMENT_MODES, SEARCH_MODES, search_all
 
 
 class GlobalSearchAPIView(APIView):
+    throttle_classes = [SearchRateThrottle]
+
     def get(self, request):
         q = request.GET.get("q", "").strip()
 
         if len(q) < 2:
             return Response({"error": "Query too short"}, status=400)
 
-        results = {}
+        mode = request.GET.get("mode") or None
+        if mode is not None and mode not in SEARCH_MODES:
+            return Response({"error": f"Unknown mode, expected one of: {', '.join(SEARCH_MODES)}"}, status=400)
+        if mode in DOCUMENT_MODES and not settings.SEARCH_DOCUMENTS:
+            return Response({"error": f"Mode {mode} requires the search document index"}, status=400)
 
-        for cfg in SEARCH_CONFIG:
-            results[cfg["key"]] = perform_search(
-                model=cfg["model"],
-                fields=cfg["fields"],
-                values=cfg["values"],
-                query=q,
-                request=request,   # ← ВАЖНО
+        if settings.SEARCH_DOCUMENTS:
+            # Все источники - один запрос к SearchDocument
+            results, timed_out = search_documents(
+                q, request, mode=mode, timeout_ms=int(settings.SEARCH_TIMEOUT * 1000),
             )
+        else:
+            # Модели ищутся параллельно; не уложившиеся в SEARCH_TIMEOUT
+            # возвращаются пустыми и перечисляются в timed_out
+            results, timed_out = search_all(SEARCH_CONFIG, q, request, mode=mode)
+        if timed_out:
+            results["timed_out"] = timed_out
 
         return Response(results)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TrainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'train'
+
+    def ready(self):
+        from train import signals  # noqa: F401
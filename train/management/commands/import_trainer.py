@@ -4,6 +4,7 @@ from django.core.management.base import BaseCommand
 import requests
 from urllib.parse import urlparse
 from django.utils.text import slugify
+from search.services.documents import batch_updates
 from django.core.files.base import ContentFile
 from train.models import Course, Level, Topic, AudioFile, Phrase
 BASE_DOMAIN = "https://platform.ucanspeak.ru"
@@ -94,6 +95,12 @@ class Command(BaseCommand):
     help = 'Импорт курса из папки с levels.json'
 
     def handle(self, *args, **options):
+        # Поисковый индекс пересчитывается одним сбросом на весь импорт,
+        # а не после каждого сохранённого объекта
+        with batch_updates():
+            self.import_files(*args, **options)
+
+    def import_files(self, *args, **options):
         course_dir = input("Введите путь к папке курса (где лежит levels.json): ").strip()
         levels_json_path = os.path.join(course_dir, "levels.json")
 
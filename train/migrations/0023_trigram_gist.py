@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:29
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('train', '0022_leveldone_topicdone'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='phrase',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['text_ru'], name='trainer_phrase_ru_gist', opclasses=['gist_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='phrase',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['text_en'], name='trainer_phrase_en_gist', opclasses=['gist_trgm_ops']),
+        ),
+    ]
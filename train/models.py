@@ -1,7 +1,7 @@
 from django.db import models
 from django.utils.text import slugify
 from django.conf import settings
-from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import GinIndex, GistIndex
 
 class Course(models.Model):
     name = models.CharField(max_length=255)
@@ -101,11 +101,21 @@ class Phrase(models.Model):
                 fields=["text_ru"],
                 opclasses=["gin_trgm_ops"],
             ),
+            GistIndex(
+                name="trainer_phrase_ru_gist",
+                fields=["text_ru"],
+                opclasses=["gist_trgm_ops"],
+            ),
             GinIndex(
                 name="trainer_phrase_en_trgm",
                 fields=["text_en"],
                 opclasses=["gin_trgm_ops"],
             ),
+            GistIndex(
+                name="trainer_phrase_en_gist",
+                fields=["text_en"],
+                opclasses=["gist_trgm_ops"],
+            ),
         ]
 
     def __str__(self):
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+
+from train.models import Course, Level, Topic, AudioFile, Phrase
+from lesson.services.content_cache import bump_content_version
+
+# Изменение контента тренажёра (админка, import_trainer) меняет ETag эндпоинтов тренажёра
+CONTENT_MODELS = (Course, Level, Topic, AudioFile, Phrase)
+
+
+def content_changed(sender, **kwargs):
+    bump_content_version("train")
+
+
+for model in CONTENT_MODELS:
+    post_save.connect(content_changed, sender=model, dispatch_uid=f"train_content_changed_save_{model.__name__}")
+    post_delete.connect(content_changed, sender=model, dispatch_uid=f"train_content_changed_delete_{model.__name__}")
@@ -6,6 +6,8 @@ from rest_framework.views import APIView
 from django.db.models import Prefetch, Value, BooleanField
 from django.db import transaction
 
+from lesson.services.content_cache import conditional_content, bump_progress_version
+from ucanspeack_api.throttling import ToggleRateThrottle
 from .models import Course, Level, Topic, Phrase, PhraseFavorite, TopicDone, LevelDone
 from .serializers import (
     CourseSerializer,
@@ -33,6 +35,10 @@ class CourseListView(ListAPIView):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
 
+    @conditional_content("train")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 # 2️⃣ Уровни по slug курса
 class LevelListByCourseView(ListAPIView):
@@ -47,6 +53,7 @@ class LevelListByCourseView(ListAPIView):
             .order_by("order_num")
         )
 
+    @conditional_content("train")
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
 
@@ -79,6 +86,7 @@ class TopicListByLevelView(ListAPIView):
             .order_by("order")
         )
 
+    @conditional_content("train")
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
 
@@ -127,6 +135,7 @@ class TopicDetailView(RetrieveAPIView):
             )
         )
 
+    @conditional_content("train")
     def retrieve(self, request, *args, **kwargs):
         topic = self.get_object()
 
@@ -147,6 +156,8 @@ class TopicDetailView(RetrieveAPIView):
 
 
 class ToggleFavoriteAPIView(APIView):
+    throttle_classes = [ToggleRateThrottle]
+
     def post(self, request, *args, **kwargs):
         user = request.user
         obj, created = PhraseFavorite.objects.get_or_create(
@@ -155,10 +166,12 @@ class ToggleFavoriteAPIView(APIView):
         )
         if not created:
             obj.delete()
+        bump_progress_version(user)
         return Response(status=200)
 
 
 class TopicDoneAPIView(APIView):
+    throttle_classes = [ToggleRateThrottle]
 
     def post(self, request):
         topic_id = request.data["topic_id"]
@@ -183,6 +196,8 @@ class TopicDoneAPIView(APIView):
                     status=status.HTTP_200_OK
                 )
 
+            bump_progress_version(request.user)
+
             # Проверяем, выполнены ли все топики в уровне
             level = topic.level
             total_topics = level.topics.count()
@@ -0,0 +1,49 @@
+"""
+Системные проверки настроек.
+
+Кеш должен быть общим для всех процессов приложения.
+Версии контента (ETag/снапшоты), кеш токенов и его отзыв, кеш доступов и
+счётчики троттлинга живут в Django-кеше. С LocMemCache у каждого воркера
+своя копия: после правки контента другие воркеры отдают старые снапшоты и 304,
+отозванный токен действует до истечения TTL, лимиты умножаются на число воркеров.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from search.utils import DOCUMENT_MODES, SEARCH_MODES
+
+PROCESS_LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend in PROCESS_LOCAL_BACKENDS and settings.WEB_CONCURRENCY > 1:
+        return [Error(
+            f"Кеш {backend} не общий для {settings.WEB_CONCURRENCY} процессов (WEB_CONCURRENCY)",
+            hint="Задайте REDIS_URL или запускайте один процесс",
+            id="ucanspeack_api.E001",
+        )]
+    return []
+
+
+@register()
+def check_search_mode(app_configs, **kwargs):
+    # SEARCH_MODE задаётся переменной окружения - опечатка ломала бы каждый поиск
+    if settings.SEARCH_MODE not in SEARCH_MODES:
+        return [Error(
+            f"Неизвестный SEARCH_MODE = {settings.SEARCH_MODE!r}",
+            hint=f"Допустимые режимы: {', '.join(SEARCH_MODES)}",
+            id="ucanspeack_api.E003",
+        )]
+    # Без SearchDocument режим по умолчанию не работает ни в одном запросе
+    if settings.SEARCH_MODE in DOCUMENT_MODES and not settings.SEARCH_DOCUMENTS:
+        return [Error(
+            f"SEARCH_MODE = {settings.SEARCH_MODE!r} требует SEARCH_DOCUMENTS = True",
+            hint="Включите SEARCH_DOCUMENTS или выберите режим similar/knn/icontains",
+            id="ucanspeack_api.E002",
+        )]
+    return []
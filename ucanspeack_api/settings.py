@@ -89,6 +89,76 @@ DATABASES = {
 }
 
 
+# Cache
+# Без REDIS_URL используется локальный кеш процесса (LocMemCache). Он годится
+# только для одного процесса: при WEB_CONCURRENCY > 1 без REDIS_URL приложение
+# не запустится (ucanspeack_api.checks)
+REDIS_URL = os.getenv('REDIS_URL')
+# Число процессов приложения (gunicorn берёт его из той же переменной окружения)
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Время жизни снапшотов контента (курс/уровень/урок/модуль), сек.
+# Снапшоты и так инвалидируются версией контента при любом изменении.
+CONTENT_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+# Отложенная запись User.last_lesson_url: период сброса буфера, сек. (0 - писать сразу)
+# и время жизни свежего значения в кеше для чтения из других процессов
+LAST_LESSON_URL_FLUSH_INTERVAL = 5
+LAST_LESSON_URL_CACHE_TIMEOUT = 60 * 60
+
+# Кеш токенов авторизации: общий кеш, сек.; LRU процесса - TTL, сек. и размер
+TOKEN_CACHE_TIMEOUT = 60 * 5
+TOKEN_CACHE_LOCAL_TTL = 5
+TOKEN_CACHE_LOCAL_SIZE = 10000
+
+# Подписанные токены (token_format="signed" при входе): срок жизни, сек.
+# и период перечитывания списка отозванных сессий, сек.
+SIGNED_TOKEN_MAX_AGE = 60 * 60 * 24
+SIGNED_TOKEN_REVOCATION_REFRESH = 30
+
+# Срок жизни токенов: без активности и максимальный с момента входа, сек.;
+# last_seen пишется в БД не чаще раза в TOKEN_LAST_SEEN_INTERVAL сек.
+TOKEN_IDLE_TTL = 60 * 60 * 24 * 30
+TOKEN_ABSOLUTE_TTL = 60 * 60 * 24 * 180
+TOKEN_LAST_SEEN_INTERVAL = 60 * 10
+
+# При достижении max_logins: True - удалить давно не использованную сессию,
+# False - отказать во входе
+LOGIN_EVICT_OLDEST = False
+
+# Потоки для хеширования паролей при массовой загрузке учеников
+PUPIL_IMPORT_HASH_WORKERS = 4
+
+# Кеш доступа к платным урокам (user.services.entitlements), сек.
+ENTITLEMENT_CACHE_TIMEOUT = 60 * 60
+
+# Глобальный поиск: потоков для параллельных запросов по моделям (каждый держит
+# постоянное соединение с БД) и общий дедлайн, сек. (не успевшие модели возвращаются пустыми)
+SEARCH_WORKERS = 8
+SEARCH_TIMEOUT = 2.0
+# Режим поиска по умолчанию (search.utils.SEARCH_MODES):
+# icontains - подстрока, similar - оператор %, knn - сортировка по <-> из GiST-индекса,
+# fts - полнотекстовый по SearchDocument.search_vector с триграммами для опечаток
+# (только при SEARCH_DOCUMENTS = True, иначе ошибка ucanspeack_api.E002).
+# По умолчанию - прежний поиск подстроки; fts включается переменной окружения SEARCH_MODE
+SEARCH_MODE = os.getenv('SEARCH_MODE', 'icontains')
+# Порог pg_trgm.similarity_threshold для режимов similar, knn и fts
+SEARCH_SIMILARITY_THRESHOLD = 0.3
+# Порог pg_trgm.word_similarity_threshold - опечатки в отдельных словах (режим fts)
+SEARCH_WORD_SIMILARITY_THRESHOLD = 0.5
+# Искать по таблице SearchDocument одним запросом (заполняется миграцией
+# search.0003, затем сигналами; rebuild_search_index - после bulk-загрузок);
+# False - параллельные запросы к таблицам источников
+SEARCH_DOCUMENTS = True
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -139,6 +209,11 @@ REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_RATES': {
         'user': '100/minute',
         'anon': '50/minute',
+        # ucanspeack_api.throttling
+        'login': '10/minute',
+        'login_ip': '30/minute',
+        'search': '60/minute',
+        'toggle': '120/minute',
     },
 
 }
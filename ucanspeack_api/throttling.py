@@ -0,0 +1,101 @@
+"""
+Троттлинг по скользящему окну на двух счётчиках.
+
+Стандартный SimpleRateThrottle хранит в кеше список меток времени всех
+запросов окна и перезаписывает его целиком на каждый запрос. Здесь на
+клиента приходится два целых числа: счётчик текущего и предыдущего
+фиксированного окна. Оценка числа запросов за последние `duration` секунд:
+
+    prev * (1 - доля прошедшего текущего окна) + current
+
+Сначала атомарный incr (INCR в Redis), потом сравнение его результата с
+лимитом: параллельные запросы не проходят проверку раньше, чем посчитаны.
+Отклонённые запросы тоже считаются - клиент, который долбит сверх лимита,
+остаётся заблокированным, пока не снизит темп.
+"""
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    cache_format = "throttle_%(scope)s_%(ident)s"
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, offset = divmod(self.now, self.duration)
+        window = int(window)
+        current_key = f"{self.key}:{window}"
+        previous_key = f"{self.key}:{window - 1}"
+
+        # Счётчик живёт два окна: в следующем окне он становится "предыдущим"
+        if self.cache.add(current_key, 1, self.duration * 2):
+            current = 1
+        else:
+            try:
+                current = self.cache.incr(current_key)
+            except ValueError:
+                # Ключ истёк между add и incr
+                self.cache.set(current_key, 1, self.duration * 2)
+                current = 1
+
+        weight = 1 - offset / self.duration
+        previous = self.cache.get(previous_key, 0)
+        self.estimate = previous * weight + current
+        if self.estimate > self.num_requests:
+            self.previous_count = previous
+            return self.throttle_failure()
+        return True
+
+    def wait(self):
+        """Через сколько секунд оценка опустится ниже лимита (не позже конца окна)"""
+        remaining = self.duration - self.now % self.duration
+        if not self.previous_count:
+            return remaining
+        excess = self.estimate - self.num_requests
+        return min(remaining, excess * self.duration / self.previous_count)
+
+
+class LoginRateThrottle(SlidingWindowRateThrottle):
+    """Попытки входа - по паре IP + логин (логин хешируется, чтобы не попадал в ключ кеша)"""
+    scope = "login"
+
+    def get_cache_key(self, request, view):
+        data = request.data if isinstance(request.data, dict) else {}
+        login = str(data.get("login", "")).strip().lower()
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": f"{self.get_ident(request)}:{hashlib.md5(login.encode()).hexdigest()}",
+        }
+
+
+class LoginIpRateThrottle(SlidingWindowRateThrottle):
+    """Попытки входа с одного IP по любым логинам (перебор одного пароля по списку почт)"""
+    scope = "login_ip"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
+
+
+class UserOrIpRateThrottle(SlidingWindowRateThrottle):
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class SearchRateThrottle(UserOrIpRateThrottle):
+    scope = "search"
+
+
+class ToggleRateThrottle(UserOrIpRateThrottle):
+    scope = "toggle"
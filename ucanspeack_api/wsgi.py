@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.core.checks import Tags, run_checks
+from django.core.exceptions import ImproperlyConfigured
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ucanspeack_api.settings')
 
 application = get_wsgi_application()
+
+# gunicorn системные проверки не запускает - проверяем общий кеш сами
+_errors = [error for error in run_checks(tags=[Tags.caches]) if error.is_serious()]
+if _errors:
+    raise ImproperlyConfigured("; ".join(str(error) for error in _errors))
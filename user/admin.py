@@ -58,6 +58,7 @@ class UserTokenAdmin(admin.ModelAdmin):
         "user_email",
         "user_login",
         "created",
+        "signed",
         "short_key",
     )
 
@@ -72,6 +73,7 @@ class UserTokenAdmin(admin.ModelAdmin):
 
     list_filter = (
         "created",
+        "signed",
     )
 
     ordering = ("-created",)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     name = 'user'
     verbose_name = 'Пользователи'
+
+    def ready(self):
+        from user import signals  # noqa: F401
+        from ucanspeack_api import checks  # noqa: F401
@@ -1,7 +1,11 @@
 # app/authentication.py
+from django.utils import timezone
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from user.models import UserToken
+from user.services.token_cache import get_cached_token, cache_token
+from user.services.signed_tokens import SIGNED_TOKEN_PREFIX, parse_signed_token, is_revoked
+from user.services.context import UserContext
 
 class MultiTokenAuthentication(BaseAuthentication):
     def authenticate(self, request):
@@ -10,10 +14,55 @@ class MultiTokenAuthentication(BaseAuthentication):
             return None
 
         key = auth.replace("Token ", "")
+        if key.startswith(SIGNED_TOKEN_PREFIX):
+            return self.authenticate_signed(key)
 
-        try:
-            token = UserToken.objects.select_related("user").get(key=key)
-        except UserToken.DoesNotExist:
+        cached = get_cached_token(key)
+        if cached is None:
+            try:
+                token = UserToken.objects.select_related("user").get(key=key)
+            except UserToken.DoesNotExist:
+                raise AuthenticationFailed("Invalid token")
+            cache_token(token)
+            cached = (token.user, token)
+
+        # id сессии подписанного токена сам по себе не является токеном
+        if cached[1].signed:
+            raise AuthenticationFailed("Invalid token")
+        return self.check_expiry(cached)
+
+    def authenticate_signed(self, key):
+        """Проверка подписи и отзыва в памяти; пользователь - из кеша токенов"""
+        parsed = parse_signed_token(key)
+        if parsed is None:
+            raise AuthenticationFailed("Invalid token")
+        user_id, session_id = parsed
+        if is_revoked(session_id):
+            raise AuthenticationFailed("Invalid token")
+
+        cached = get_cached_token(session_id)
+        if cached is None:
+            try:
+                token = UserToken.objects.select_related("user").get(key=session_id, signed=True)
+            except UserToken.DoesNotExist:
+                raise AuthenticationFailed("Invalid token")
+            cache_token(token)
+            cached = (token.user, token)
+
+        if not cached[1].signed or cached[1].user_id != user_id:
             raise AuthenticationFailed("Invalid token")
+        return self.check_expiry(cached)
 
-        return (token.user, token)
+    def check_expiry(self, cached):
+        """Истёкший токен отклоняется; last_seen обновляется с прореживанием"""
+        token = cached[1]
+        now = timezone.now()
+        if token.is_expired(now):
+            raise AuthenticationFailed("Token expired")
+        if token.touch(now):
+            # Кешированная копия должна видеть новый last_seen, иначе
+            # каждый запрос считал бы запись в БД необходимой
+            cache_token(token)
+        user = cached[0]
+        user.context = UserContext(user)
+        return cached
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from .models import UserToken
+from .services.token_cache import invalidate_tokens, invalidate_user_tokens
 
 
 class CustomLogoutView(APIView):
@@ -26,6 +27,7 @@ class CustomLogoutView(APIView):
 
         if all_devices:
             # Удаляем все токены пользователя
+            invalidate_user_tokens(user.pk)
             deleted_count, _ = UserToken.objects.filter(user=user).delete()
             return Response(
                 {
@@ -36,6 +38,7 @@ class CustomLogoutView(APIView):
         else:
             # Удаляем только текущий токен
             if hasattr(request, 'auth') and request.auth:
+                invalidate_tokens([request.auth.key])
                 request.auth.delete()
                 return Response(
                     {"detail": "Successfully logged out from this device."},
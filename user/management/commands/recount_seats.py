@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from user.services.seats import recount_seats
+
+
+class Command(BaseCommand):
+    help = "Пересчёт School.seats_used (сумма max_logins учеников) по таблице учеников"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--school", type=int, nargs="*", help="ID школ (по умолчанию все)")
+
+    def handle(self, *args, **options):
+        updated = recount_seats(options["school"] or None)
+        self.stdout.write(self.style.SUCCESS(f"✅ Пересчитано школ: {updated}"))
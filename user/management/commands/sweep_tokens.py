@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from user.services.sessions import sweep_expired_tokens
+
+
+class Command(BaseCommand):
+    help = "Удаление истёкших токенов авторизации (запускать по расписанию, например cron раз в час)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        tokens, revoked = sweep_expired_tokens(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Удалено токенов: {tokens}, отозванных сессий: {revoked}"
+        ))
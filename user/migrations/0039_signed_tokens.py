@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0038_user_max_logins'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(max_length=64, unique=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Отозванная сессия',
+                'verbose_name_plural': 'Отозванные сессии',
+            },
+        ),
+        migrations.AddField(
+            model_name='usertoken',
+            name='signed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
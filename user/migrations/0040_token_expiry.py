@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:17
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_last_seen(apps, schema_editor):
+    # Активность старых токенов неизвестна: окно простоя отсчитываем с момента
+    # выката, иначе все токены старше TOKEN_IDLE_TTL разлогинились бы разом
+    UserToken = apps.get_model('user', 'UserToken')
+    UserToken.objects.update(last_seen=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0039_signed_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertoken',
+            name='last_seen',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(fill_last_seen, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='usertoken',
+            index=models.Index(fields=['user', 'created'], name='user_userto_user_id_27e66f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertoken',
+            index=models.Index(fields=['created'], name='user_userto_created_28a786_idx'),
+        ),
+    ]
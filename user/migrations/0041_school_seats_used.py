@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:23
+
+from django.db import migrations, models
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_seats_used(apps, schema_editor):
+    School = apps.get_model('user', 'School')
+    totals = (
+        School.pupils.through.objects
+        .filter(school_id=OuterRef('pk'))
+        .order_by()
+        .values('school_id')
+        .annotate(total=Sum('user__max_logins'))
+        .values('total')
+    )
+    School.objects.update(seats_used=Coalesce(Subquery(totals), Value(0), output_field=IntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0040_token_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='school',
+            name='seats_used',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_seats_used, migrations.RunPython.noop),
+    ]
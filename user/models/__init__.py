@@ -1,5 +1,5 @@
 from .user import User
-from .token import UserToken
+from .token import UserToken, RevokedSession
 from .school import School
 
-__all__ = ['User','UserToken','School']
\ No newline at end of file
+__all__ = ['User','UserToken','RevokedSession','School']
\ No newline at end of file
@@ -13,4 +13,6 @@ class School(models.Model):
                               blank=False,
                               null=True
                               )
-    pupils = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='pupils', blank=True)
\ No newline at end of file
+    pupils = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='pupils', blank=True)
+    # Сумма max_logins учеников (поддерживается user.services.seats)
+    seats_used = models.IntegerField(default=0, editable=False)
@@ -1,17 +1,82 @@
 import uuid
+from datetime import timedelta
+
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+
+class UserTokenQuerySet(models.QuerySet):
+    def live(self, now=None):
+        """
+        Токены, не истёкшие ни по простою (TOKEN_IDLE_TTL), ни по возрасту (TOKEN_ABSOLUTE_TTL);
+        сессии подписанных токенов - ещё и не старше SIGNED_TOKEN_MAX_AGE
+        """
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(signed=False) | models.Q(created__gt=now - timedelta(seconds=settings.SIGNED_TOKEN_MAX_AGE)),
+            last_seen__gt=now - timedelta(seconds=settings.TOKEN_IDLE_TTL),
+            created__gt=now - timedelta(seconds=settings.TOKEN_ABSOLUTE_TTL),
+        )
+
+    def expired(self, now=None):
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(last_seen__lte=now - timedelta(seconds=settings.TOKEN_IDLE_TTL))
+            | models.Q(created__lte=now - timedelta(seconds=settings.TOKEN_ABSOLUTE_TTL))
+            | models.Q(signed=True, created__lte=now - timedelta(seconds=settings.SIGNED_TOKEN_MAX_AGE))
+        )
+
 
 class UserToken(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     key = models.CharField(max_length=64, unique=True)
     created = models.DateTimeField(auto_now_add=True)
+    # Обновляется не чаще раза в TOKEN_LAST_SEEN_INTERVAL (см. touch)
+    last_seen = models.DateTimeField(default=timezone.now, db_index=True)
+    # Сессия подписанного токена (s1.*): key - id сессии внутри токена,
+    # сам key как обычный токен не принимается
+    signed = models.BooleanField(default=False)
+
+    objects = UserTokenQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Токен авторизации"
         verbose_name_plural = "Токены авторизации"
+        indexes = [
+            models.Index(fields=["user", "created"]),
+            models.Index(fields=["created"]),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.key:
             self.key = uuid.uuid4().hex
         super().save(*args, **kwargs)
+
+    def is_expired(self, now=None):
+        now = now or timezone.now()
+        return (
+            self.last_seen <= now - timedelta(seconds=settings.TOKEN_IDLE_TTL)
+            or self.created <= now - timedelta(seconds=settings.TOKEN_ABSOLUTE_TTL)
+            # Подписанный токен сессии после SIGNED_TOKEN_MAX_AGE уже не принимается
+            or (self.signed and self.created <= now - timedelta(seconds=settings.SIGNED_TOKEN_MAX_AGE))
+        )
+
+    def touch(self, now=None):
+        """Обновляет last_seen, если с прошлой записи прошло больше TOKEN_LAST_SEEN_INTERVAL"""
+        now = now or timezone.now()
+        if now - self.last_seen < timedelta(seconds=settings.TOKEN_LAST_SEEN_INTERVAL):
+            return False
+        self.last_seen = now
+        UserToken.objects.filter(pk=self.pk).update(last_seen=now)
+        return True
+
+
+class RevokedSession(models.Model):
+    """Отозванные сессии подписанных токенов; хранятся до истечения срока токена"""
+    session_id = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Отозванная сессия"
+        verbose_name_plural = "Отозванные сессии"
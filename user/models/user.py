@@ -53,6 +53,8 @@ class User(AbstractUser):
 
     last_lesson_url = models.CharField(max_length=255, blank=True, null=True)
 
+    # Массово менять только через user.services.entitlements.update_users - update()
+    # не шлёт сигналов, и кеши токенов и доступов остались бы старыми
     subscription_expire = models.DateField('Подписка до', blank=True, null=True)
     max_logins = models.IntegerField('Одновременное кол-во подключений', default=5, null=True)
 
@@ -1,7 +1,9 @@
 from djoser.serializers import TokenCreateSerializer
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from user.models import UserToken
+from user.services.signed_tokens import make_signed_token
+from user.services.sessions import open_session, SessionLimitReached
 
 User = get_user_model()
 
@@ -10,6 +12,8 @@ MAX_SESSIONS = 1
 class CustomTokenCreateSerializer(TokenCreateSerializer):
     login = serializers.CharField(required=True)
     password = serializers.CharField(required=True, write_only=True)
+    # "signed" - подписанный токен с ограниченным сроком, проверяемый без БД
+    token_format = serializers.ChoiceField(choices=["opaque", "signed"], default="opaque", write_only=True)
 
     def validate(self, attrs):
         login = attrs.get("login")
@@ -23,12 +27,18 @@ class CustomTokenCreateSerializer(TokenCreateSerializer):
         if not user.check_password(password):
             raise serializers.ValidationError("Invalid password")
 
-        # проверяем количество активных сессий
-        count = UserToken.objects.filter(user=user).count()
-        if count >= user.max_logins:
+        # лимит активных сессий проверяется атомарно вместе с созданием токена
+        signed = attrs.get("token_format") == "signed"
+        try:
+            token = open_session(user, signed=signed)
+        except SessionLimitReached:
             raise serializers.ValidationError("Maximum sessions limit reached")
 
-        token = UserToken.objects.create(user=user)
+        if signed:
+            return {
+                "auth_token": make_signed_token(token),
+                "expires_in": settings.SIGNED_TOKEN_MAX_AGE,
+            }
 
         return {
             "auth_token": token.key
@@ -1,8 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from datetime import date
-from user.models import School
+from user.services.context import get_user_context
+from user.services.last_lesson import get_last_lesson_url, forget_last_lesson_url
 User = get_user_model()
 
 
@@ -44,6 +44,8 @@ class UserSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
+        if 'last_lesson_url' in validated_data:
+            forget_last_lesson_url(instance.pk)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         if password:
@@ -51,10 +53,19 @@ class UserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Последний урок мог ещё не дойти до БД (см. user.services.last_lesson);
+        # для списков значения заранее кладутся в context['last_lesson_urls']
+        urls = self.context.get('last_lesson_urls')
+        data['last_lesson_url'] = urls[instance.pk] if urls is not None else get_last_lesson_url(instance)
+        return data
+
     def get_is_pupil(self, obj):
-        return School.objects.filter(pupils=obj).exists()
+        # Для учеников своей школы вызывающий код передаёт context['is_pupil']=True
+        if 'is_pupil' in self.context:
+            return self.context['is_pupil']
+        return get_user_context(obj).is_pupil
 
     def get_is_subscription_expired(self, obj):
-        if obj.subscription_expire is None:
-            return True  # Если дата не установлена, считаем подписку истекшей
-        return obj.subscription_expire < date.today()
\ No newline at end of file
+        return get_user_context(obj).is_subscription_expired
\ No newline at end of file
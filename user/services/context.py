@@ -0,0 +1,74 @@
+"""
+Контекст пользователя на время запроса: школа, статус ученика, подписка,
+доступ (entitlement, см. user.services.entitlements).
+
+MultiTokenAuthentication прикрепляет его к request.user; данные о школе
+загружаются лениво одним запросом при первом обращении, подписка считается
+по уже загруженному пользователю. Вьюхи и сериализаторы читают отсюда вместо
+повторных School.objects.filter(pupils=...).
+"""
+from datetime import date
+from functools import cached_property
+
+from django.db.models import OuterRef, Subquery
+
+from user.models import User, School
+
+
+class UserContext:
+    def __init__(self, user):
+        self.user = user
+
+    def __getstate__(self):
+        # Пользователь кешируется вместе с контекстом (кеш токенов) -
+        # загруженные данные о школе и доступе в кеш не попадают
+        return {"user": self.user}
+
+    @cached_property
+    def _schools(self):
+        pupil_of = School.pupils.through.objects.filter(user_id=OuterRef("pk")).order_by("id")
+        admin_of = School.objects.filter(admin_id=OuterRef("pk")).order_by("id")
+        row = (
+            User.objects
+            .filter(pk=self.user.pk)
+            .values(
+                pupil_school_id=Subquery(pupil_of.values("school_id")[:1]),
+                pupil_school_expire=Subquery(pupil_of.values("school__admin__subscription_expire")[:1]),
+                admin_school_id=Subquery(admin_of.values("id")[:1]),
+            )
+            .first()
+        )
+        return row or {"pupil_school_id": None, "pupil_school_expire": None, "admin_school_id": None}
+
+    @property
+    def pupil_school_id(self):
+        """Школа, в которой пользователь учится"""
+        return self._schools["pupil_school_id"]
+
+    @property
+    def pupil_school_expire(self):
+        """Подписка администратора школы ученика - ученики получают доступ по ней"""
+        return self._schools["pupil_school_expire"]
+
+    @property
+    def admin_school_id(self):
+        """Школа, которой пользователь управляет"""
+        return self._schools["admin_school_id"]
+
+    @property
+    def is_pupil(self):
+        return self.pupil_school_id is not None
+
+    @property
+    def is_subscription_expired(self):
+        # Если дата не установлена, считаем подписку истекшей
+        expire = self.user.subscription_expire
+        return expire is None or expire < date.today()
+
+
+def get_user_context(user):
+    """Контекст, прикреплённый при аутентификации, или новый (для чужих объектов User)"""
+    context = getattr(user, "context", None)
+    if context is None:
+        context = user.context = UserContext(user)
+    return context
@@ -0,0 +1,87 @@
+"""
+Доступ к платным урокам.
+
+Полный доступ даёт активная подписка пользователя, подписка администратора
+школы, в которой пользователь учится, или права staff/superuser. Бесплатные
+уроки (Lesson.is_free) открыты всем. Дата окончания доступа считается один
+раз (запрос к школе - через UserContext) и хранится в кеше до изменения
+пользователя, администратора его школы или состава учеников.
+
+Сигналы post_save/m2m_changed сбрасывают кеш только при сохранении через ORM.
+QuerySet.update() полей доступа (subscription_expire, is_active, is_staff,
+is_superuser) запрещён - массовые изменения только через update_users().
+"""
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from user.models import User, UserToken, School
+from user.services.context import get_user_context
+from user.services.token_cache import invalidate_tokens
+
+ENTITLEMENT_KEY = "entitlement:{user_id}"
+
+
+def _compute(user):
+    if user.is_superuser or user.is_staff:
+        return {"unlimited": True, "until": None}
+    dates = [d for d in (user.subscription_expire, get_user_context(user).pupil_school_expire) if d]
+    return {"unlimited": False, "until": max(dates) if dates else None}
+
+
+def get_entitlement(user):
+    """{"unlimited": bool, "until": date | None}; для анонима - без доступа"""
+    if not user.is_authenticated:
+        return {"unlimited": False, "until": None}
+    context = get_user_context(user)
+    entitlement = getattr(context, "entitlement", None)
+    if entitlement is None:
+        key = ENTITLEMENT_KEY.format(user_id=user.pk)
+        entitlement = cache.get(key)
+        if entitlement is None:
+            entitlement = _compute(user)
+            cache.set(key, entitlement, settings.ENTITLEMENT_CACHE_TIMEOUT)
+        context.entitlement = entitlement
+    return entitlement
+
+
+def has_full_access(user):
+    entitlement = get_entitlement(user)
+    if entitlement["unlimited"]:
+        return True
+    # Сравнение с сегодняшней датой при чтении - кеш не нужно сбрасывать в день окончания
+    return entitlement["until"] is not None and entitlement["until"] >= date.today()
+
+
+def can_open_lesson(user, is_free):
+    return is_free or has_full_access(user)
+
+
+def invalidate_entitlements(user_ids):
+    user_ids = list(user_ids)
+    if user_ids:
+        cache.delete_many([ENTITLEMENT_KEY.format(user_id=user_id) for user_id in user_ids])
+
+
+def invalidate_access(user_ids):
+    """Доступ пользователей и учеников школ, где они администраторы"""
+    user_ids = list(user_ids)
+    pupil_ids = School.pupils.through.objects.filter(school__admin_id__in=user_ids).values_list("user_id", flat=True)
+    invalidate_entitlements([*user_ids, *pupil_ids])
+
+
+def update_users(users, **fields):
+    """
+    users.update(**fields) со сбросом кеша токенов (в нём копия пользователя)
+    и доступов - для массовой смены подписки или блокировки. Возвращает число строк.
+    """
+    with transaction.atomic():
+        user_ids = list(users.values_list("pk", flat=True))
+        updated = User.objects.filter(pk__in=user_ids).update(**fields)
+        invalidate_tokens(UserToken.objects.filter(user_id__in=user_ids).values_list("key", flat=True))
+        invalidate_access(user_ids)
+        # Повторно после коммита: параллельный запрос мог закешировать старый доступ
+        transaction.on_commit(lambda: invalidate_access(user_ids))
+    return updated
@@ -0,0 +1,146 @@
+"""
+Отложенная запись User.last_lesson_url.
+
+Просмотр модуля не пишет в user_user: последний URL кладётся в буфер процесса
+(и в общий кеш - для чтения из других процессов), а фоновый таймер раз в
+LAST_LESSON_URL_FLUSH_INTERVAL секунд сохраняет весь буфер одним
+UPDATE ... FROM (VALUES ...). При штатной остановке процесса буфер сбрасывается
+через atexit.
+
+Окно потери: если воркер убит без atexit (SIGKILL, OOM), в БД не попадут
+переходы за последние LAST_LESSON_URL_FLUSH_INTERVAL секунд. Другие процессы
+видят их через общий кеш ещё LAST_LESSON_URL_CACHE_TIMEOUT секунд. Поле - только
+подсказка "продолжить с урока", поэтому такой потерей жертвуем ради записи без
+UPDATE на каждый просмотр; LAST_LESSON_URL_FLUSH_INTERVAL = 0 пишет сразу.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+
+from user.models import User
+
+logger = logging.getLogger(__name__)
+
+LAST_LESSON_URL_KEY = "last_lesson_url:{user_id}"
+
+_lock = threading.Lock()
+_pending = {}
+_timer = None
+
+
+def _flush_interval():
+    return settings.LAST_LESSON_URL_FLUSH_INTERVAL
+
+
+def remember_last_lesson_url(user_id, url):
+    """Запоминает URL без обращения к БД; запись произойдёт при ближайшем сбросе"""
+    cache.set(LAST_LESSON_URL_KEY.format(user_id=user_id), url, settings.LAST_LESSON_URL_CACHE_TIMEOUT)
+    interval = _flush_interval()
+    with _lock:
+        _pending[user_id] = url
+        if interval and _timer is None:
+            _schedule(interval)
+    if not interval:
+        flush_last_lesson_urls()
+
+
+def forget_last_lesson_url(user_id):
+    """Явная запись поля (PATCH профиля) важнее отложенной"""
+    with _lock:
+        _pending.pop(user_id, None)
+    cache.delete(LAST_LESSON_URL_KEY.format(user_id=user_id))
+
+
+def get_last_lesson_url(user):
+    """Самое свежее значение: буфер процесса, затем общий кеш, затем БД"""
+    with _lock:
+        url = _pending.get(user.pk)
+    if url is None:
+        url = cache.get(LAST_LESSON_URL_KEY.format(user_id=user.pk))
+    return user.last_lesson_url if url is None else url
+
+
+def get_last_lesson_urls(users):
+    """То же для списка пользователей: один get_many вместо запроса к кешу на каждого"""
+    users = list(users)
+    with _lock:
+        urls = {user.pk: _pending[user.pk] for user in users if user.pk in _pending}
+    missing = {LAST_LESSON_URL_KEY.format(user_id=user.pk): user.pk for user in users if user.pk not in urls}
+    for key, url in cache.get_many(list(missing)).items():
+        urls[missing[key]] = url
+    return {user.pk: urls.get(user.pk, user.last_lesson_url) for user in users}
+
+
+def _schedule(interval):
+    global _timer
+    _timer = threading.Timer(interval, _flush_in_background)
+    _timer.daemon = True
+    _timer.start()
+
+
+def _flush_in_background():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        flush_last_lesson_urls()
+    except Exception:
+        logger.exception("Не удалось сохранить last_lesson_url")
+    finally:
+        # У потока таймера собственное соединение с БД
+        connection.close()
+
+
+def flush_last_lesson_urls(requeue=True):
+    """
+    Сохраняет буфер одним запросом. Возвращает количество записанных пользователей.
+    requeue=False - при ошибке не возвращать значения в буфер
+    """
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+    if not batch:
+        return 0
+
+    table = connection.ops.quote_name(User._meta.db_table)
+    values = ", ".join(["(%s::bigint, %s)"] * len(batch))
+    params = [value for item in batch.items() for value in item]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS u SET last_lesson_url = v.url "
+                f"FROM (VALUES {values}) AS v(id, url) WHERE u.id = v.id",
+                params,
+            )
+    except Exception:
+        if not requeue:
+            raise
+        # Возвращаем в буфер то, что не перезаписано более новыми значениями
+        with _lock:
+            for user_id, url in batch.items():
+                _pending.setdefault(user_id, url)
+            if _timer is None and _flush_interval():
+                _schedule(_flush_interval())
+        raise
+    return len(batch)
+
+
+def _flush_at_exit():
+    with _lock:
+        if _timer is not None:
+            _timer.cancel()
+        pending = len(_pending)
+    if not pending:
+        return
+    try:
+        flush_last_lesson_urls(requeue=False)
+    except DatabaseError as exc:
+        # БД уже недоступна (например, тестовая база удалена) - без трейсбека
+        logger.warning("Не удалось сохранить last_lesson_url при остановке (%s польз.): %s", pending, exc)
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,194 @@
+"""
+Массовое добавление/обновление учеников школы (CSV или JSON).
+
+Все строки проверяются заранее, лимит подключений школы - один раз на всю
+пачку (по School.seats_used). Если есть ошибки, ничего не записывается и возвращаются ошибки по
+строкам. Новые пользователи создаются одним bulk_create, связи со школой -
+одной вставкой в M2M-таблицу; пароли хешируются параллельно в пуле потоков
+(PBKDF2 в hashlib отпускает GIL).
+"""
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from rest_framework import serializers
+
+from user.models import User, UserToken, School
+from user.services.token_cache import invalidate_tokens
+from user.services.seats import lock_school, seats_available
+
+MAX_ROWS = 1000
+UPDATE_FIELDS = ("full_name", "phone", "max_logins")
+CSV_ENCODINGS = ("utf-8-sig", "cp1251")
+
+
+class PupilRowSerializer(serializers.Serializer):
+    email = serializers.EmailField(max_length=255)
+    password = serializers.CharField(required=False, allow_blank=True, write_only=True)
+    full_name = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=255)
+    phone = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=255)
+    max_logins = serializers.IntegerField(required=False, min_value=0)
+
+
+class PupilImportError(Exception):
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+def _decode(data):
+    """UTF-8 (с BOM или без) либо cp1251 - CSV из Excel с русской локалью"""
+    for encoding in CSV_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise PupilImportError({"detail": "Неизвестная кодировка файла, сохраните CSV в UTF-8"})
+
+
+def parse_rows(request):
+    """Строки из загруженного CSV (поле file) или JSON: список либо {"pupils": [...]}"""
+    upload = request.FILES.get("file")
+    if upload is not None:
+        text = _decode(upload.read())
+        try:
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        try:
+            return [
+                {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+                for row in csv.DictReader(io.StringIO(text), dialect=dialect)
+            ]
+        except csv.Error as exc:
+            raise PupilImportError({"detail": f"Не удалось разобрать CSV: {exc}"})
+
+    data = request.data
+    if isinstance(data, dict):
+        data = data.get("pupils")
+    if not isinstance(data, list):
+        raise PupilImportError({"detail": "Ожидается CSV-файл (file) или JSON-список учеников"})
+    return data
+
+
+def _hash_passwords(passwords):
+    with ThreadPoolExecutor(max_workers=settings.PUPIL_IMPORT_HASH_WORKERS) as pool:
+        return list(pool.map(make_password, passwords))
+
+
+def import_pupils(school, rows):
+    """
+    Создаёт новых учеников и обновляет существующих учеников школы (по email).
+    Возвращает {"created": [...id], "updated": [...id]} или бросает PupilImportError.
+    """
+    if not rows:
+        raise PupilImportError({"detail": "Список учеников пуст"})
+    if len(rows) > MAX_ROWS:
+        raise PupilImportError({"detail": f"Не больше {MAX_ROWS} учеников за раз"})
+
+    errors = []
+    valid = []
+    seen = set()
+    for index, row in enumerate(rows, start=1):
+        serializer = PupilRowSerializer(data=row)
+        if not serializer.is_valid():
+            errors.append({"row": index, "errors": serializer.errors})
+            continue
+        data = serializer.validated_data
+        if data["email"] in seen:
+            errors.append({"row": index, "errors": {"email": ["Повторяется в файле"]}})
+            continue
+        seen.add(data["email"])
+        valid.append((index, data))
+
+    existing = {
+        user.email: user
+        for user in User.objects.filter(email__in=seen).only("id", "email", "password", *UPDATE_FIELDS)
+    }
+    pupil_ids = set(
+        school.pupils.through.objects
+        .filter(school=school, user_id__in=[user.id for user in existing.values()])
+        .values_list("user_id", flat=True)
+    )
+
+    to_create = []
+    to_update = []
+    for index, data in valid:
+        user = existing.get(data["email"])
+        if user is None:
+            if not data.get("password"):
+                errors.append({"row": index, "errors": {"password": ["Обязательное поле для нового ученика"]}})
+                continue
+            to_create.append(data)
+        elif user.id in pupil_ids:
+            to_update.append((user, data))
+        else:
+            errors.append({"row": index, "errors": {"email": ["Пользователь с такой почтой уже существует"]}})
+
+    if errors:
+        raise PupilImportError({"errors": errors})
+
+    # Хешируем до транзакции, чтобы не держать её открытой
+    hashed = iter(_hash_passwords(
+        [data["password"] for data in to_create]
+        + [data["password"] for _, data in to_update if data.get("password")]
+    ))
+
+    default_max_logins = User._meta.get_field("max_logins").default
+    with transaction.atomic():
+        # Лимит подключений проверяется один раз на всю пачку по заблокированному счётчику
+        school = lock_school(pk=school.pk)
+        updated_ids = [user.id for user, _ in to_update]
+        delta = sum(data.get("max_logins", default_max_logins) for data in to_create)
+        # max_logins = NULL в счётчике мест идёт как 0 (Sum пропускает NULL)
+        delta += sum(
+            (data.get("max_logins", user.max_logins) or 0) - (user.max_logins or 0)
+            for user, data in to_update
+        )
+        if delta > seats_available(school):
+            raise PupilImportError({
+                "detail": f"Превышен лимит подключений. Доступно: {seats_available(school)}",
+            })
+
+        try:
+            with transaction.atomic():
+                new_users = User.objects.bulk_create([
+                    User(
+                        email=data["email"],
+                        password=next(hashed),
+                        full_name=data.get("full_name"),
+                        phone=data.get("phone"),
+                        max_logins=data.get("max_logins", default_max_logins),
+                        subscription_expire=school.admin.subscription_expire,
+                    )
+                    for data in to_create
+                ])
+        except IntegrityError:
+            # Почту заняли параллельно, пока шла проверка
+            raise PupilImportError({"detail": "Часть почт уже зарегистрирована, повторите загрузку"})
+        School.pupils.through.objects.bulk_create([
+            School.pupils.through(school_id=school.id, user_id=user.id) for user in new_users
+        ])
+
+        update_fields = set()
+        for user, data in to_update:
+            for field in UPDATE_FIELDS:
+                if field in data:
+                    setattr(user, field, data[field])
+                    update_fields.add(field)
+            if data.get("password"):
+                user.password = next(hashed)
+                update_fields.add("password")
+        if update_fields:
+            User.objects.bulk_update([user for user, _ in to_update], sorted(update_fields))
+            # bulk_update не шлёт post_save - сбрасываем кеш токенов вручную
+            invalidate_tokens(UserToken.objects.filter(user_id__in=updated_ids).values_list("key", flat=True))
+
+        # bulk_create связей и bulk_update не шлют сигналов, которые ведут seats_used
+        School.objects.filter(pk=school.pk).update(seats_used=F("seats_used") + delta)
+
+    return {"created": [user.id for user in new_users], "updated": updated_ids}
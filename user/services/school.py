@@ -1,15 +1,21 @@
-from django.db.models import Sum
+from django.db.models import Sum, OuterRef, Subquery, IntegerField, Value
+from django.db.models.functions import Coalesce
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
-from django.db import models
+from django.db import models, transaction
 
 from user.models import User
 from user.models.school import School
 
 from user.serializers.me import UserSerializer
+from user.services.last_lesson import get_last_lesson_urls
+from user.services.pupil_import import import_pupils, parse_rows, PupilImportError
+from user.services.seats import lock_school, seats_available
+from lesson.models import LessonProgress, CourseProgress
 
 
 def create_school(admin_user:User):
@@ -19,88 +25,142 @@ def create_school(admin_user:User):
     )
 
 
+class PupilCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = 'id'
+
+
+def pupil_progress_subquery(model, field):
+    """Сумма счётчика сводной таблицы прогресса по ученику (0, если строк нет)"""
+    totals = (
+        model.objects
+        .filter(user=OuterRef('pk'))
+        .order_by()
+        .values('user')
+        .annotate(total=Sum(field))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals), Value(0), output_field=IntegerField())
+
+
 class SchoolPupilViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
-    def get_school(self, request):
+    def get_school(self, request, lock=False):
+        if lock:
+            # Блокировка строки школы сериализует изменения учеников и счётчика мест
+            return lock_school(admin=request.user)
         return get_object_or_404(School, admin=request.user)
 
-    def check_max_logins_limit(self, school, new_max_logins, exclude_pupil_id=None):
-        pupils_qs = school.pupils.all()
-        if exclude_pupil_id:
-            pupils_qs = pupils_qs.exclude(id=exclude_pupil_id)
-
-        current_sum = pupils_qs.aggregate(total=Sum('max_logins'))['total'] or 0
-        admin_limit = school.admin.max_logins
+    def check_max_logins_limit(self, school, new_max_logins, current_max_logins=0):
+        """school - из get_school(lock=True); O(1) по School.seats_used"""
+        return new_max_logins - current_max_logins <= seats_available(school)
 
-        return (current_sum + new_max_logins) <= admin_limit
+    def limit_exceeded_response(self, school, current_max_logins=0):
+        return Response(
+            {'detail': f'Превышен лимит подключений. Доступно: {seats_available(school) + current_max_logins}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
     # GET /school-pupils/
+    # ?cursor= / ?page_size= - постраничная выдача курсором (без них - весь список, как раньше)
+    # ?progress=1 - добавить колонки прогресса (пройдено уроков/блоков)
     def list(self, request):
         school = self.get_school(request)
         pupils = school.pupils.all()
-        serializer = UserSerializer(pupils, many=True)
-        print(serializer.data[0] if serializer.data else 'empty')
-        return Response(serializer.data)
+        with_progress = request.query_params.get('progress') in ('1', 'true')
+        if with_progress:
+            pupils = pupils.annotate(
+                done_lessons=pupil_progress_subquery(CourseProgress, 'done_lessons'),
+                done_blocks=pupil_progress_subquery(LessonProgress, 'done_blocks'),
+            )
+
+        paginator = None
+        if 'cursor' in request.query_params or 'page_size' in request.query_params:
+            paginator = PupilCursorPagination()
+            pupils = paginator.paginate_queryset(pupils, request, view=self)
+        else:
+            pupils = list(pupils)
+
+        serializer = UserSerializer(pupils, many=True, context={
+            'is_pupil': True,
+            'last_lesson_urls': get_last_lesson_urls(pupils),
+        })
+        data = serializer.data
+        if with_progress:
+            for row, pupil in zip(data, pupils):
+                row['progress'] = {
+                    'done_lessons': pupil.done_lessons,
+                    'done_blocks': pupil.done_blocks,
+                }
+
+        if paginator is not None:
+            return paginator.get_paginated_response(data)
+        return Response(data)
 
     # POST /school-pupils/
     def create(self, request):
-        school = self.get_school(request)
         serializer = UserSerializer(data=request.data)
 
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        new_max_logins = serializer.validated_data.get('max_logins', 0)
-
-        if not self.check_max_logins_limit(school, new_max_logins):
-            return Response(
-                {
-                    'detail': f'Превышен лимит подключений. Доступно: {school.admin.max_logins - school.pupils.aggregate(total=models.Sum("max_logins"))["total"] or 0}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        pupil = serializer.save()
+        new_max_logins = serializer.validated_data.get('max_logins', User._meta.get_field('max_logins').default) or 0
 
-        pupil.subscription_expire = school.admin.subscription_expire
-        pupil.save()
+        with transaction.atomic():
+            school = self.get_school(request, lock=True)
+            if not self.check_max_logins_limit(school, new_max_logins):
+                return self.limit_exceeded_response(school)
 
-        school.pupils.add(pupil)
+            serializer.save(subscription_expire=school.admin.subscription_expire)
+            school.pupils.add(serializer.instance)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     # GET /school-pupils/{id}/
     def retrieve(self, request, pk=None):
         school = self.get_school(request)
         pupil = get_object_or_404(school.pupils, id=pk)
-        serializer = UserSerializer(pupil)
+        serializer = UserSerializer(pupil, context={'is_pupil': True})
         return Response(serializer.data)
 
     # PUT/PATCH /school-pupils/{id}/
     def partial_update(self, request, pk=None):
-        school = self.get_school(request)
-        pupil = get_object_or_404(school.pupils, id=pk)
-        serializer = UserSerializer(pupil, data=request.data, partial=True)
+        with transaction.atomic():
+            school = self.get_school(request, lock=True)
+            pupil = get_object_or_404(school.pupils, id=pk)
+            serializer = UserSerializer(pupil, data=request.data, partial=True, context={'is_pupil': True})
 
-        if not serializer.is_valid():
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        new_max_logins = serializer.validated_data.get('max_logins', pupil.max_logins)
+            # max_logins = NULL в счётчике мест идёт как 0
+            new_max_logins = serializer.validated_data.get('max_logins', pupil.max_logins) or 0
+            current_max_logins = pupil.max_logins or 0
 
-        if not self.check_max_logins_limit(school, new_max_logins, exclude_pupil_id=pk):
-            used = school.pupils.exclude(id=pk).aggregate(total=Sum('max_logins'))['total'] or 0
-            available = school.admin.max_logins - used
-            return Response(
-                {'detail': f'Превышен лимит подключений. Доступно: {available}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            if not self.check_max_logins_limit(school, new_max_logins, current_max_logins=current_max_logins):
+                return self.limit_exceeded_response(school, current_max_logins=current_max_logins)
 
-        serializer.save()
+            serializer.save()
         return Response(serializer.data)
 
+    # POST /school-pupils/bulk/
+    # CSV-файл в поле file (email;password;full_name;phone;max_logins) или JSON-список
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        school = self.get_school(request)
+        try:
+            result = import_pupils(school, parse_rows(request))
+        except PupilImportError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
     # DELETE /school-pupils/{id}/
     def destroy(self, request, pk=None):
-        school = self.get_school(request)
-        pupil = get_object_or_404(school.pupils, id=pk)
-        school.pupils.remove(pupil)  # убираем из школы, не удаляем юзера
-        # pupil.delete()  # раскомментировать если нужно удалять юзера полностью
+        with transaction.atomic():
+            school = self.get_school(request, lock=True)
+            pupil = get_object_or_404(school.pupils, id=pk)
+            school.pupils.remove(pupil)  # убираем из школы, не удаляем юзера
+            # pupil.delete()  # раскомментировать если нужно удалять юзера полностью
         return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
@@ -0,0 +1,44 @@
+"""
+Счётчик School.seats_used - сумма max_logins учеников школы.
+
+Проверка лимита подключений - чтение одного поля заблокированной строки
+школы (lock_school) вместо агрегата по всем ученикам. Счётчик меняется
+сигналами: m2m_changed у School.pupils, post_save пользователя (смена max_logins)
+и удаление пользователя. После правок в обход ORM - команда recount_seats.
+"""
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.shortcuts import get_object_or_404
+
+from user.models import User, School
+
+
+def lock_school(**lookup):
+    """Школа с админом, строка заблокирована до конца транзакции"""
+    return get_object_or_404(School.objects.select_for_update(of=("self",)).select_related("admin"), **lookup)
+
+
+def seats_available(school):
+    return (school.admin.max_logins or 0) - school.seats_used
+
+
+def recount_seats(schools=None):
+    """schools - queryset или список id школ, None - все школы"""
+    totals = (
+        School.pupils.through.objects
+        .filter(school_id=OuterRef("pk"))
+        .order_by()
+        .values("school_id")
+        .annotate(total=Sum("user__max_logins"))
+        .values("total")
+    )
+    target = School.objects.all() if schools is None else School.objects.filter(pk__in=schools)
+    return target.update(
+        seats_used=Coalesce(Subquery(totals), Value(0), output_field=IntegerField())
+    )
+
+
+def add_seats(school_id, user_ids, sign=1):
+    total = User.objects.filter(pk__in=user_ids).aggregate(total=Sum("max_logins"))["total"] or 0
+    if total:
+        School.objects.filter(pk=school_id).update(seats_used=F("seats_used") + sign * total)
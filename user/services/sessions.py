@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from user.models import User, UserToken, RevokedSession
+from user.services.token_cache import cache_token
+
+
+class SessionLimitReached(Exception):
+    pass
+
+
+def open_session(user, signed=False):
+    """
+    Создаёт токен с соблюдением user.max_logins. Строка пользователя блокируется
+    (SELECT ... FOR UPDATE), поэтому параллельные входы не проскакивают лимит.
+    При LOGIN_EVICT_OLDEST вместо отказа удаляются давно не использованные
+    сессии. Истёкшие сессии (в том числе подписанные старше SIGNED_TOKEN_MAX_AGE)
+    в лимит не входят. После коммита токен кладётся в кеш - первый запрос с ним не идёт в БД.
+    """
+    with transaction.atomic():
+        User.objects.select_for_update().only("pk").get(pk=user.pk)
+        live = list(
+            UserToken.objects
+            .filter(user=user).live()
+            .order_by("last_seen", "created")
+            .values_list("pk", flat=True)
+        )
+        if user.max_logins is not None and len(live) >= user.max_logins:
+            if not settings.LOGIN_EVICT_OLDEST:
+                raise SessionLimitReached()
+            evict = live[:len(live) - user.max_logins + 1]
+            UserToken.objects.filter(pk__in=evict).delete()
+
+        token = UserToken.objects.create(user=user, signed=signed)
+        transaction.on_commit(lambda: cache_token(token))
+    return token
+
+
+def sweep_expired_tokens(batch_size=1000):
+    """
+    Удаляет истёкшие токены пачками по индексам last_seen/created, каждая пачка -
+    отдельная транзакция. Сигналы удаления (кеш токенов, отзыв подписанных
+    сессий) срабатывают как при обычном logout. Возвращает (токенов, отзывов).
+    """
+    now = timezone.now()
+    tokens = 0
+    while True:
+        with transaction.atomic():
+            ids = list(UserToken.objects.expired(now).order_by().values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            UserToken.objects.filter(pk__in=ids).delete()
+        tokens += len(ids)
+
+    revoked, _ = RevokedSession.objects.filter(expires_at__lte=now).delete()
+    return tokens, revoked
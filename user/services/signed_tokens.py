@@ -0,0 +1,78 @@
+"""
+Подписанные токены (opt-in, формат "s1.<подписанные данные>").
+
+Токен несёт id пользователя и id сессии (UserToken.key сессии с signed=True)
+и проверяется по HMAC с SECRET_KEY без обращения к БД. Срок жизни -
+SIGNED_TOKEN_MAX_AGE. Отзыв (logout, удаление сессии) пишется в RevokedSession;
+каждый процесс держит множество отозванных id в памяти и перечитывает его
+раз в SIGNED_TOKEN_REVOCATION_REFRESH секунд.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from user.models import RevokedSession
+
+SIGNED_TOKEN_PREFIX = "s1."
+SIGNED_TOKEN_SALT = "user.signed_token"
+
+_lock = threading.Lock()
+_revoked = frozenset()
+_revoked_loaded_at = None
+
+
+def make_signed_token(session):
+    """session - UserToken с signed=True"""
+    payload = {"u": session.user_id, "s": session.key}
+    return SIGNED_TOKEN_PREFIX + signing.dumps(payload, salt=SIGNED_TOKEN_SALT, compress=False)
+
+
+def parse_signed_token(token):
+    """(user_id, session_id) или None для поддельного/просроченного токена"""
+    try:
+        payload = signing.loads(
+            token[len(SIGNED_TOKEN_PREFIX):],
+            salt=SIGNED_TOKEN_SALT,
+            max_age=settings.SIGNED_TOKEN_MAX_AGE,
+        )
+    except signing.BadSignature:
+        return None
+    return payload["u"], payload["s"]
+
+
+def _revoked_sessions():
+    global _revoked, _revoked_loaded_at
+    now = time.monotonic()
+    if _revoked_loaded_at is None or now - _revoked_loaded_at > settings.SIGNED_TOKEN_REVOCATION_REFRESH:
+        revoked = frozenset(
+            RevokedSession.objects
+            .filter(expires_at__gt=timezone.now())
+            .values_list("session_id", flat=True)
+        )
+        with _lock:
+            _revoked = revoked
+            _revoked_loaded_at = now
+    return _revoked
+
+
+def is_revoked(session_id):
+    return session_id in _revoked_sessions()
+
+
+def revoke_sessions(sessions):
+    """sessions - UserToken с signed=True; токены отклоняются сразу в этом процессе"""
+    global _revoked
+    sessions = [session for session in sessions if session.signed]
+    if not sessions:
+        return
+    max_age = timedelta(seconds=settings.SIGNED_TOKEN_MAX_AGE)
+    RevokedSession.objects.bulk_create(
+        [RevokedSession(session_id=session.key, expires_at=session.created + max_age) for session in sessions],
+        ignore_conflicts=True,
+    )
+    with _lock:
+        _revoked = _revoked | {session.key for session in sessions}
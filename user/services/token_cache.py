@@ -0,0 +1,91 @@
+"""
+Двухуровневый кеш токенов для MultiTokenAuthentication.
+
+1. LRU в памяти процесса с коротким TTL (TOKEN_CACHE_LOCAL_TTL) - попадание
+   стоит поиска в словаре и распаковки pickle, без сети и БД.
+2. Общий Django-кеш (TOKEN_CACHE_TIMEOUT) - разделяется между процессами.
+
+Хранятся pickle-байты пары (user, token), поэтому каждый запрос получает свои
+экземпляры моделей. Выход, удаление токена и любое сохранение пользователя
+(в том числе деактивация) удаляют записи явно; другие процессы видят отзыв
+не позже чем через TOKEN_CACHE_LOCAL_TTL секунд.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from user.models import UserToken
+
+TOKEN_CACHE_KEY = "auth_token:{key}"
+
+_lock = threading.Lock()
+_local = OrderedDict()
+
+
+def _cache_key(key):
+    return TOKEN_CACHE_KEY.format(key=key)
+
+
+def _local_get(key):
+    with _lock:
+        entry = _local.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            del _local[key]
+            return None
+        _local.move_to_end(key)
+        return payload
+
+
+def _local_set(key, payload):
+    with _lock:
+        _local[key] = (time.monotonic() + settings.TOKEN_CACHE_LOCAL_TTL, payload)
+        _local.move_to_end(key)
+        while len(_local) > settings.TOKEN_CACHE_LOCAL_SIZE:
+            _local.popitem(last=False)
+
+
+def get_cached_token(key):
+    """(user, token) из кеша или None"""
+    payload = _local_get(key)
+    if payload is None:
+        payload = cache.get(_cache_key(key))
+        if payload is None:
+            return None
+        _local_set(key, payload)
+    return pickle.loads(payload)
+
+
+def cache_token(token):
+    """token - UserToken с загруженным user"""
+    payload = pickle.dumps((token.user, token), pickle.HIGHEST_PROTOCOL)
+    cache.set(_cache_key(token.key), payload, settings.TOKEN_CACHE_TIMEOUT)
+    _local_set(token.key, payload)
+
+
+def _drop(keys):
+    with _lock:
+        for key in keys:
+            _local.pop(key, None)
+    cache.delete_many([_cache_key(key) for key in keys])
+
+
+def invalidate_tokens(keys):
+    keys = list(keys)
+    if not keys:
+        return
+    _drop(keys)
+    # Повторно после коммита: параллельный запрос мог успеть прочитать
+    # ещё не удалённый токен из БД и положить его обратно в кеш
+    transaction.on_commit(lambda: _drop(keys))
+
+
+def invalidate_user_tokens(user_id):
+    invalidate_tokens(UserToken.objects.filter(user_id=user_id).values_list("key", flat=True))
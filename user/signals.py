@@ -0,0 +1,93 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+
+from user.models import User, UserToken, School
+from user.services.seats import add_seats, recount_seats
+from user.services.token_cache import invalidate_tokens, invalidate_user_tokens
+from user.services.signed_tokens import revoke_sessions
+from user.services.entitlements import invalidate_access, invalidate_entitlements
+
+
+def user_changed(sender, instance, created, **kwargs):
+    # В кеше токенов лежит копия пользователя: деактивация, смена подписки
+    # или прав должны действовать сразу
+    if not created:
+        invalidate_user_tokens(instance.pk)
+
+
+def token_deleted(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+    revoke_sessions([instance])
+
+
+def pupils_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # user.pupils.add(school): instance - пользователь, pk_set - школы
+        if action == "pre_clear":
+            instance._seats_schools = list(School.objects.filter(pupils=instance).values_list("pk", flat=True))
+        elif action in ("post_add", "post_remove"):
+            recount_seats(pk_set)
+        elif action == "post_clear":
+            recount_seats(getattr(instance, "_seats_schools", []))
+        return
+
+    if action == "post_add":
+        add_seats(instance.pk, pk_set)
+    elif action == "post_remove":
+        add_seats(instance.pk, pk_set, sign=-1)
+    elif action == "post_clear":
+        School.objects.filter(pk=instance.pk).update(seats_used=0)
+
+
+def entitlement_user_changed(sender, instance, created, **kwargs):
+    # Подписка администратора школы - это доступ всех её учеников
+    if created:
+        return
+    invalidate_access([instance.pk])
+
+
+def entitlement_pupils_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            invalidate_entitlements([instance.pk])
+    elif action == "pre_clear":
+        instance._entitlement_pupils = list(instance.pupils.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove"):
+        invalidate_entitlements(pk_set)
+    elif action == "post_clear":
+        invalidate_entitlements(getattr(instance, "_entitlement_pupils", []))
+
+
+def pupil_saving(sender, instance, update_fields=None, **kwargs):
+    # Прежний max_logins - только у учеников школ, остальным счётчик не нужен
+    if instance._state.adding or (update_fields is not None and "max_logins" not in update_fields):
+        return
+    instance._seats_previous = list(
+        User.objects.filter(pk=instance.pk, pupils__isnull=False).values_list("max_logins", flat=True)[:1]
+    )
+
+
+def pupil_seats_changed(sender, instance, created, **kwargs):
+    previous = instance.__dict__.pop("_seats_previous", None)
+    if previous and previous[0] != instance.max_logins:
+        recount_seats(School.objects.filter(pupils=instance).values("pk"))
+
+
+def pupil_deleting(sender, instance, **kwargs):
+    # Каскадное удаление связей со школами не шлёт m2m_changed
+    instance._seats_schools = list(School.objects.filter(pupils=instance).values_list("pk", flat=True))
+
+
+def pupil_deleted(sender, instance, **kwargs):
+    if getattr(instance, "_seats_schools", None):
+        recount_seats(instance._seats_schools)
+
+
+post_save.connect(user_changed, sender=User, dispatch_uid="token_cache_user_changed")
+post_delete.connect(token_deleted, sender=UserToken, dispatch_uid="token_cache_token_deleted")
+pre_save.connect(pupil_saving, sender=User, dispatch_uid="seats_pupil_saving")
+post_save.connect(pupil_seats_changed, sender=User, dispatch_uid="seats_pupil_changed")
+pre_delete.connect(pupil_deleting, sender=User, dispatch_uid="seats_pupil_deleting")
+post_delete.connect(pupil_deleted, sender=User, dispatch_uid="seats_pupil_deleted")
+m2m_changed.connect(pupils_changed, sender=School.pupils.through, dispatch_uid="seats_pupils_changed")
+post_save.connect(entitlement_user_changed, sender=User, dispatch_uid="entitlement_user_changed")
+m2m_changed.connect(entitlement_pupils_changed, sender=School.pupils.through, dispatch_uid="entitlement_pupils_changed")
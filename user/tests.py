@@ -0,0 +1,258 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from lesson.models import Course, Level, Lesson
+from user.models import User, UserToken, School
+from user.services.entitlements import update_users
+from user.services.sessions import sweep_expired_tokens
+from user.services.token_cache import invalidate_tokens
+
+LOGIN_URL = "/auth/token/login/"
+ME_URL = "/api/user/me"
+
+
+def create_user(email="pupil@example.com", **fields):
+    fields.setdefault("subscription_expire", date.today() + timedelta(days=30))
+    return User.objects.create_user(email=email, password="secret", **fields)
+
+
+def token_client(key):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {key}")
+    return client
+
+
+class TokenCacheTest(TestCase):
+    """Кеш токенов и доступов сбрасывается при выходе и смене подписки"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.key = UserToken.objects.create(user=self.user).key
+        course = Course.objects.create(title="Course", slug="course")
+        level = Level.objects.create(course=course, title="Level", slug="level")
+        self.lesson = Lesson.objects.create(level=level, title="Paid", slug="paid")
+
+    def get_lesson(self, key):
+        return token_client(key).get(f"/api/lesson/lessons/{self.lesson.slug}/")
+
+    def test_logout_revokes_cached_token(self):
+        client = token_client(self.key)
+        self.assertEqual(client.get(ME_URL).status_code, 200)
+        self.assertEqual(client.post("/auth/token/logout/").status_code, 204)
+        # У MultiTokenAuthentication нет authenticate_header - DRF отвечает 403
+        self.assertEqual(token_client(self.key).get(ME_URL).status_code, 403)
+
+    def test_update_users_drops_cached_access(self):
+        self.assertEqual(self.get_lesson(self.key).status_code, 200)
+        update_users(User.objects.filter(pk=self.user.pk), subscription_expire=date.today() - timedelta(days=1))
+        self.assertEqual(self.get_lesson(self.key).status_code, 403)
+
+    def test_update_users_drops_pupils_access(self):
+        admin = create_user("admin@example.com")
+        school = School.objects.create(name="School", admin=admin)
+        school.pupils.add(create_user("school-pupil@example.com", subscription_expire=None))
+        pupil_key = UserToken.objects.create(user=school.pupils.get()).key
+        self.assertEqual(self.get_lesson(pupil_key).status_code, 200)
+
+        update_users(User.objects.filter(pk=admin.pk), subscription_expire=None)
+        self.assertEqual(self.get_lesson(pupil_key).status_code, 403)
+
+
+class TokenSessionTest(TestCase):
+    """Срок жизни, отзыв и лимит сессий токенов"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(max_logins=2)
+        self.client = APIClient()
+
+    def login(self, **extra):
+        return self.client.post(LOGIN_URL, {"login": self.user.email, "password": "secret", **extra}, format="json")
+
+    def assertRejected(self, key, detail="Invalid token"):
+        # У MultiTokenAuthentication нет authenticate_header - DRF отвечает 403
+        response = token_client(key).get(ME_URL)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["detail"], detail)
+
+    def age_token(self, key, **fields):
+        """Сдвигает created/last_seen в прошлое и сбрасывает кеш токенов"""
+        UserToken.objects.filter(key=key).update(**fields)
+        invalidate_tokens([key])
+
+    def test_login_returns_working_token(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(token_client(response.json()["auth_token"]).get(ME_URL).status_code, 200)
+
+    def test_idle_token_expires(self):
+        key = self.login().json()["auth_token"]
+        self.age_token(key, last_seen=timezone.now() - timedelta(seconds=settings.TOKEN_IDLE_TTL + 1))
+        self.assertRejected(key, "Token expired")
+
+    def test_old_token_expires(self):
+        key = self.login().json()["auth_token"]
+        self.age_token(key, created=timezone.now() - timedelta(seconds=settings.TOKEN_ABSOLUTE_TTL + 1))
+        self.assertRejected(key, "Token expired")
+
+    def test_session_limit(self):
+        first = self.login().json()["auth_token"]
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login().status_code, 400)
+
+        # Истёкшая сессия в лимит не входит
+        self.age_token(first, last_seen=timezone.now() - timedelta(seconds=settings.TOKEN_IDLE_TTL + 1))
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_sweep_removes_expired_tokens(self):
+        key = self.login().json()["auth_token"]
+        live = self.login().json()["auth_token"]
+        self.age_token(key, last_seen=timezone.now() - timedelta(seconds=settings.TOKEN_IDLE_TTL + 1))
+        self.assertEqual(sweep_expired_tokens(), (1, 0))
+        self.assertEqual(list(UserToken.objects.values_list("key", flat=True)), [live])
+
+    def test_signed_session_expires_with_token(self):
+        token = self.login(token_format="signed").json()["auth_token"]
+        self.assertTrue(token.startswith("s1."))
+        self.assertEqual(token_client(token).get(ME_URL).status_code, 200)
+
+        session = UserToken.objects.get(user=self.user, signed=True)
+        self.age_token(session.key, created=timezone.now() - timedelta(seconds=settings.SIGNED_TOKEN_MAX_AGE + 1))
+        self.assertRejected(token, "Token expired")
+        self.assertFalse(UserToken.objects.live().filter(pk=session.pk).exists())
+        self.assertTrue(UserToken.objects.expired().filter(pk=session.pk).exists())
+
+    def test_session_key_is_not_a_token(self):
+        self.login(token_format="signed")
+        session = UserToken.objects.get(user=self.user, signed=True)
+        self.assertRejected(session.key)
+
+    def test_logout_revokes_signed_token(self):
+        token = self.login(token_format="signed").json()["auth_token"]
+        self.assertEqual(token_client(token).post("/auth/token/logout/").status_code, 204)
+        self.assertRejected(token)
+
+
+class LoginThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+
+    def attempt(self, login, password="wrong"):
+        return self.client.post(LOGIN_URL, {"login": login, "password": password}, format="json")
+
+    def test_login_attempts_are_limited(self):
+        for _ in range(10):
+            self.assertEqual(self.attempt(self.user.email).status_code, 400)
+        self.assertEqual(self.attempt(self.user.email).status_code, 429)
+        # Лимит по паре IP + логин: другой логин с того же IP ещё пускаем
+        self.assertEqual(self.attempt("other@example.com").status_code, 400)
+
+    def test_attempts_from_one_ip_are_limited(self):
+        for i in range(30):
+            self.assertEqual(self.attempt(f"user{i}@example.com").status_code, 400)
+        self.assertEqual(self.attempt(self.user.email, "secret").status_code, 429)
+
+    def test_non_object_body(self):
+        response = self.client.post(LOGIN_URL, ["login"], format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class SchoolPupilsTest(TestCase):
+    """Счётчик мест школы и массовая загрузка учеников"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_user("admin@example.com", max_logins=10)
+        self.school = School.objects.create(name="School", admin=self.admin)
+        self.client = token_client(UserToken.objects.create(user=self.admin).key)
+
+    def seats_used(self):
+        return School.objects.get(pk=self.school.pk).seats_used
+
+    def upload(self, content, name="pupils.csv"):
+        return self.client.post(
+            "/api/user/school-pupils/bulk/",
+            {"file": SimpleUploadedFile(name, content, content_type="text/csv")},
+            format="multipart",
+        )
+
+    def test_cp1251_csv(self):
+        content = "email;password;full_name;max_logins\npupil@example.com;secret123;Иван Петров;2\n"
+        response = self.upload(content.encode("cp1251"))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(User.objects.get(email="pupil@example.com").full_name, "Иван Петров")
+        self.assertEqual(self.seats_used(), 2)
+
+    def test_undecodable_csv(self):
+        # 0x98 не декодируется ни в UTF-8, ни в cp1251
+        response = self.upload(b"email;password\n\x98@example.com;secret123\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.filter(pupils=self.school).exists())
+
+    def test_seats_limit_is_checked_for_whole_batch(self):
+        rows = [
+            {"email": f"pupil{i}@example.com", "password": "secret123", "max_logins": 4}
+            for i in range(3)
+        ]
+        response = self.client.post("/api/user/school-pupils/bulk/", rows, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.seats_used(), 0)
+        self.assertFalse(User.objects.filter(email__startswith="pupil").exists())
+
+    def test_pupil_without_max_logins(self):
+        pupil = create_user(max_logins=None)
+        self.school.pupils.add(pupil)
+
+        rows = [{"email": pupil.email, "max_logins": 3}]
+        response = self.client.post("/api/user/school-pupils/bulk/", rows, format="json")
+        self.assertLess(response.status_code, 300)
+        self.assertEqual(self.seats_used(), 3)
+
+        User.objects.filter(pk=pupil.pk).update(max_logins=None)
+        response = self.client.patch(f"/api/user/school-pupils/{pupil.pk}/", {"max_logins": 4}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleting_pupil_frees_seats(self):
+        pupil = create_user(max_logins=3)
+        self.school.pupils.add(pupil)
+        self.assertEqual(self.seats_used(), 3)
+        pupil.delete()
+        self.assertEqual(self.seats_used(), 0)
+
+    def test_removing_pupil_frees_seats(self):
+        pupil = create_user(max_logins=3)
+        self.school.pupils.add(pupil)
+        self.assertEqual(self.client.delete(f"/api/user/school-pupils/{pupil.pk}/").status_code, 204)
+        self.assertEqual(self.seats_used(), 0)
+
+    def test_seats_follow_max_logins(self):
+        pupil = create_user(max_logins=3)
+        self.school.pupils.add(pupil)
+        pupil.max_logins = 5
+        pupil.save()
+        self.assertEqual(self.seats_used(), 5)
+
+    def test_save_without_max_logins_change_skips_recount(self):
+        pupil = create_user(max_logins=3)
+        self.school.pupils.add(pupil)
+        pupil.full_name = "Иван Петров"
+        with mock.patch("user.signals.recount_seats") as recount:
+            pupil.save()
+        recount.assert_not_called()
+
+    def test_recount_seats_command(self):
+        self.school.pupils.add(create_user(max_logins=3))
+        School.objects.filter(pk=self.school.pk).update(seats_used=42)
+        call_command("recount_seats", verbosity=0)
+        self.assertEqual(self.seats_used(), 3)
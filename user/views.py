@@ -4,6 +4,7 @@ from rest_framework.permissions import IsAuthenticated
 from user.serializers.me import UserSerializer
 from djoser.views import TokenCreateView
 from rest_framework import generics, viewsets, parsers
+from ucanspeack_api.throttling import LoginIpRateThrottle, LoginRateThrottle
 
 import logging
 logger = logging.getLogger(__name__)
@@ -12,6 +13,8 @@ logger = logging.getLogger(__name__)
 
 
 class CustomTokenCreateView(TokenCreateView):
+    throttle_classes = [LoginRateThrottle, LoginIpRateThrottle]
+
     def _action(self, serializer):
         serializer.is_valid(raise_exception=True)
         return Response(serializer.validated_data, status=200)